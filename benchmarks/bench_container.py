@@ -0,0 +1,77 @@
+"""
+Compare the previous textwrap based text container with the binascii one and the binary
+container, encrypting and decrypting vaults from 1 KB to 50 MB.
+
+    python benchmarks/bench_container.py [SIZE_IN_BYTES ...]
+"""
+
+import base64
+import os
+import sys
+import textwrap
+
+from common import human_bytes, peak_memory, print_table, timeit
+
+from secrets_vault.backends import AES256GCMBackend
+
+SIZES = [1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024, 50 * 1024 * 1024]
+# textwrap is superlinear and takes minutes per run on the larger vaults
+TEXTWRAP_MAX_SIZE = 1024 * 1024
+
+
+def textwrap_encrypt(backend, contents):
+    # the text container as implemented before the binascii rewrite
+    nonce = os.urandom(12)
+    ciphertext = nonce + backend._aead.encrypt(nonce, contents, b"")
+    encoded = base64.b64encode(ciphertext)
+    return "\n".join(textwrap.wrap(encoded.decode("utf8"), width=80)).encode("utf8")
+
+
+def textwrap_decrypt(backend, contents):
+    ciphertext = base64.b64decode(contents.replace(b"\n", b""))
+    return backend._aead.decrypt(ciphertext[:12], ciphertext[12:], b"")
+
+
+def main(sizes):
+    backend = AES256GCMBackend(AES256GCMBackend.generate_master_key())
+    rows = []
+    for size in sizes:
+        contents = os.urandom(size // 2).hex().encode()
+        containers = {}
+        if size <= TEXTWRAP_MAX_SIZE:
+            containers["text (textwrap)"] = (
+                lambda: textwrap_encrypt(backend, contents),
+                textwrap_decrypt,
+            )
+        containers |= {
+            "text": (
+                lambda: backend.encrypt(contents, container="text"),
+                lambda backend, ct: backend.decrypt(ct),
+            ),
+            "binary": (
+                lambda: backend.encrypt(contents, container="binary"),
+                lambda backend, ct: backend.decrypt(ct),
+            ),
+        }
+        repeat = 3 if size <= 10 * 1024 * 1024 else 1
+        for name, (encrypt, decrypt) in containers.items():
+            ciphertext = encrypt()
+            assert decrypt(backend, ciphertext) == contents
+            rows.append(
+                (
+                    human_bytes(size),
+                    name,
+                    human_bytes(len(ciphertext)),
+                    f"{timeit(encrypt, repeat=repeat) * 1000:.2f} ms",
+                    f"{timeit(lambda: decrypt(backend, ciphertext), repeat=repeat) * 1000:.2f} ms",
+                    human_bytes(peak_memory(lambda: decrypt(backend, ciphertext))),
+                )
+            )
+    print_table(
+        ["vault", "container", "on disk", "encrypt", "decrypt", "decrypt peak memory"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main([int(n) for n in sys.argv[1:]] or SIZES)
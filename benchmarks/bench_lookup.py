@@ -0,0 +1,64 @@
+"""
+Compare nested key lookups through the flattened key index with per-call pydash.get.
+
+    python benchmarks/bench_lookup.py [LOOKUPS]
+"""
+
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+import pydash
+from common import leaf_paths, make_secrets, print_table, timeit
+
+from secrets_vault import SecretsVault
+
+LOOKUPS = 10_000
+
+
+def main(lookups):
+    with tempfile.TemporaryDirectory() as tmp:
+        vault, _ = SecretsVault.create(
+            secrets_filepath=Path(tmp) / "secrets.json.enc",
+            master_key_filepath=Path(tmp) / "master.key",
+            file_format="json",
+        )
+        rows = []
+        for depth in (2, 3, 4):
+            secrets = make_secrets(lookups, depth=depth)
+            vault.secrets = secrets
+            # the index is only trusted in a tree nobody else holds, like a loaded one
+            vault.save()
+            vault.load()
+            keys = random.Random(0).sample(list(leaf_paths(secrets)), k=lookups)
+
+            def with_pydash():
+                for key in keys:
+                    pydash.get(secrets, key)
+
+            def with_index():
+                for key in keys:
+                    vault.get(key)
+
+            first = timeit(with_index, repeat=1)
+            pydash_time = timeit(with_pydash)
+            index_time = timeit(with_index)
+            rows.append(
+                (
+                    depth,
+                    lookups,
+                    f"{pydash_time * 1000:.2f} ms",
+                    f"{index_time * 1000:.2f} ms",
+                    f"{first * 1000:.2f} ms",
+                    f"{pydash_time / index_time:.1f}x",
+                )
+            )
+    print_table(
+        ["depth", "lookups", "pydash.get", "index", "index (incl. build)", "speedup"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else LOOKUPS)
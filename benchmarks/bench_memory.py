@@ -0,0 +1,72 @@
+"""
+Compare the memory held by loaded vaults, per key, in the round-trip, read-only and frozen
+modes. The key index built on the first nested lookup is included.
+
+    python benchmarks/bench_memory.py [SIZE ...]
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+from common import human_bytes, leaf_paths, make_secrets, print_table, retained_memory
+
+from secrets_vault import SecretsVault
+
+SIZES = [100_000]
+MODES = {
+    "round-trip": {},
+    "read-only": {"read_only": True},
+    "frozen": {"frozen": True},
+}
+
+
+def main(sizes):
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for file_format in ("yaml", "json"):
+            for size in sizes:
+                for depth in (1, 3):
+                    filepath = Path(tmp) / f"secrets-{size}-{depth}.{file_format}.enc"
+                    vault, master_key = SecretsVault.create(
+                        secrets_filepath=filepath,
+                        master_key_filepath=Path(tmp) / "master.key",
+                        file_format=file_format,
+                    )
+                    vault.secrets = make_secrets(size, depth=depth)
+                    vault.save()
+                    key = next(leaf_paths(vault.secrets))
+                    del vault
+
+                    baseline = None
+                    for mode, options in MODES.items():
+
+                        def load():
+                            loaded = SecretsVault(
+                                master_key=master_key,
+                                secrets_filepath=filepath,
+                                file_format=file_format,
+                                **options,
+                            )
+                            loaded.get(key)
+                            return loaded
+
+                        # warm up, so lazy imports and formatters are not counted
+                        load()
+                        per_key = retained_memory(load) / size
+                        baseline = baseline or per_key
+                        rows.append(
+                            (
+                                file_format,
+                                size,
+                                depth,
+                                mode,
+                                human_bytes(per_key),
+                                f"{per_key / baseline:.2f}x",
+                            )
+                        )
+    print_table(["format", "keys", "depth", "mode", "per key", "vs round-trip"], rows)
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or SIZES)
@@ -0,0 +1,46 @@
+"""
+Compare the round-trip parser with the read-only parsers used by `secrets get` and `envify`.
+
+    python benchmarks/bench_parse.py [SIZE ...]
+"""
+
+import sys
+from io import BytesIO
+from types import SimpleNamespace
+
+from common import human_bytes, make_secrets, peak_memory, print_table, timeit
+
+from secrets_vault import SecretsVault, formatters
+
+SIZES = [100, 1_000, 10_000]
+
+
+def main(sizes):
+    rows = []
+    for file_format in ("yaml", "json"):
+        for size in sizes:
+            writer = SimpleNamespace(file_format=file_format, read_only=False)
+            data = SecretsVault._serialize(writer, make_secrets(size, depth=2))
+            reader = SimpleNamespace(file_format=file_format, read_only=True)
+            loaders = {
+                # JSON vaults used to go through the round-trip YAML loader as well
+                "round-trip": lambda: formatters.yaml.load(BytesIO(data)),
+                "json" if file_format == "json" else "read-only": (
+                    lambda: SecretsVault._deserialize(reader, data)
+                ),
+            }
+            for name, parse in loaders.items():
+                rows.append(
+                    (
+                        file_format,
+                        size,
+                        name,
+                        f"{timeit(parse, repeat=3) * 1000:.2f} ms",
+                        human_bytes(peak_memory(parse)),
+                    )
+                )
+    print_table(["format", "keys", "loader", "parse time", "peak memory"], rows)
+
+
+if __name__ == "__main__":
+    main([int(n) for n in sys.argv[1:]] or SIZES)
@@ -0,0 +1,90 @@
+"""
+Helpers shared by the benchmark scripts in this directory.
+"""
+
+import gc
+import time
+import tracemalloc
+
+
+def make_secrets(num_keys, depth=1, width=10):
+    """
+    Build a synthetic secrets tree with num_keys leaves nested depth levels deep.
+    """
+    secrets = {}
+    for i in range(num_keys):
+        node = secrets
+        for level in range(depth - 1):
+            node = node.setdefault(
+                f"group-{level}-{(i // width ** (level + 1)) % width}", {}
+            )
+        node[f"key-{i}"] = f"value-{i}-{'x' * 24}"
+    return secrets
+
+
+def leaf_paths(secrets, prefix=""):
+    for k, v in secrets.items():
+        path = f"{prefix}{k}"
+        if isinstance(v, dict):
+            yield from leaf_paths(v, f"{path}.")
+        else:
+            yield path
+
+
+def timeit(func, repeat=5):
+    """
+    Return the best wall time in seconds out of repeat runs.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory(func):
+    """
+    Return the peak number of bytes allocated while running func.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def retained_memory(func):
+    """
+    Return the number of bytes still allocated after func returns, while its result is
+    alive, eg. the memory held by a loaded vault.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func()
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0]
+        del result
+        return retained
+    finally:
+        tracemalloc.stop()
+
+
+def human_bytes(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024 or unit == "GB":
+            return f"{n:.1f} {unit}"
+        n /= 1024
+
+
+def print_table(headers, rows):
+    widths = [
+        max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)
+    ]
+    print("  ".join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(c).ljust(w) for c, w in zip(row, widths)))
@@ -0,0 +1,289 @@
+"""
+Benchmark suite for the vault hot paths. Generates synthetic vaults of every size, depth
+and format, and measures loading, lookups, set + save, the edit round-trip, the CLI end to
+end, peak memory and file size. Results are written as JSON and compared against a
+stored baseline, failing when a benchmark regressed by more than its threshold.
+
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --sizes 10,1000 --baseline baseline.json --threshold 0.25
+    python benchmarks/suite.py --baseline baseline.json --threshold cli_get=0.5
+    python benchmarks/suite.py --save-baseline baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from common import (
+    human_bytes,
+    leaf_paths,
+    make_secrets,
+    peak_memory,
+    print_table,
+    retained_memory,
+    timeit,
+)
+
+from secrets_vault import SecretsVault
+
+SIZES = [10, 100, 1_000, 10_000, 100_000]
+DEPTHS = [1, 3]
+FORMATS = ["yaml", "json"]
+DEFAULT_THRESHOLD = 0.25
+LOOKUPS = 1_000
+RESULTS_VERSION = 1
+
+BENCHMARKS = {
+    # name: (unit, description)
+    "load": ("s", "decrypt and parse the vault"),
+    "load_read_only": ("s", "decrypt and parse with the read-only loader"),
+    "get": ("s", "nested lookup, per call"),
+    "set_save": ("s", "set one key and save"),
+    "set_save_journal": ("s", "set one key and save, in the journal container"),
+    "edit_roundtrip": ("s", "serialize and parse again, as `secrets edit` does"),
+    "cli_get": ("s", "`secrets get KEY` end to end"),
+    "cli_envify": ("s", "`secrets envify` end to end"),
+    "load_peak_memory": ("B", "peak memory allocated by load"),
+    "file_size": ("B", "encrypted vault size"),
+    "bytes_per_key": ("B", "memory held by a read-only vault, per key"),
+    "bytes_per_key_frozen": ("B", "memory held by a frozen vault, per key"),
+}
+
+
+def repeats(num_keys):
+    return 5 if num_keys <= 1_000 else 3 if num_keys <= 10_000 else 1
+
+
+def run_case(tmp, file_format, num_keys, depth, benchmarks):
+    filepath = Path(tmp) / f"secrets-{num_keys}-{depth}.{file_format}.enc"
+    vault, master_key = SecretsVault.create(
+        secrets_filepath=filepath,
+        master_key_filepath=Path(tmp) / "master.key",
+        file_format=file_format,
+    )
+    vault.secrets = make_secrets(num_keys, depth=depth)
+    vault.save()
+
+    def open_vault(read_only=False, frozen=False):
+        return SecretsVault(
+            master_key=master_key,
+            secrets_filepath=filepath,
+            file_format=file_format,
+            read_only=read_only,
+            frozen=frozen,
+        )
+
+    repeat = repeats(num_keys)
+    keys = list(leaf_paths(vault.secrets))
+    lookups = random.Random(0).choices(keys, k=LOOKUPS)
+    reader = open_vault(read_only=True)
+    reader.get(lookups[0])
+
+    def get():
+        for key in lookups:
+            reader.get(key)
+
+    writer = open_vault()
+    counter = iter(range(sys.maxsize))
+
+    def set_save():
+        # a new value every time, saving an unchanged vault is skipped
+        writer.set(lookups[0], f"value-{next(counter)}").save()
+
+    def journal_set_save():
+        journal_filepath = filepath.with_name(f"journal-{filepath.name}")
+        shutil.copy(filepath, journal_filepath)
+        journal = SecretsVault(
+            master_key=master_key,
+            secrets_filepath=journal_filepath,
+            file_format=file_format,
+            container="journal",
+        )
+        # converts the copy into a journal snapshot, outside of the timed calls
+        journal.save()
+        return lambda: journal.set(lookups[0], f"value-{next(counter)}").save()
+
+    def edit_roundtrip():
+        writer._deserialize(writer._serialize(writer.secrets))
+
+    env = {**os.environ, "MASTER_KEY": master_key, "SECRETS_VAULT_NO_AGENT": "1"}
+    cli = [
+        sys.executable,
+        "-m",
+        "secrets_vault",
+        "-s",
+        str(filepath),
+        "-f",
+        file_format,
+    ]
+
+    def bytes_per_key(**options):
+        def load():
+            vault = open_vault(**options)
+            # includes the key index, built on the first nested lookup
+            vault.get(lookups[0])
+            return vault
+
+        # warm up, so lazy imports and formatters are not counted
+        load()
+        return retained_memory(load) / num_keys
+
+    def run_cli(*args):
+        subprocess.run([*cli, *args], env=env, check=True, stdout=subprocess.DEVNULL)
+
+    measures = {
+        "load": lambda: timeit(open_vault, repeat=repeat),
+        "load_read_only": lambda: timeit(
+            lambda: open_vault(read_only=True), repeat=repeat
+        ),
+        "get": lambda: timeit(get, repeat=repeat) / LOOKUPS,
+        "set_save": lambda: timeit(set_save, repeat=repeat),
+        "set_save_journal": lambda: timeit(journal_set_save(), repeat=repeat),
+        "edit_roundtrip": lambda: timeit(edit_roundtrip, repeat=repeat),
+        "cli_get": lambda: timeit(lambda: run_cli("get", lookups[0]), repeat=3),
+        "cli_envify": lambda: timeit(lambda: run_cli("envify"), repeat=3),
+        "load_peak_memory": lambda: peak_memory(open_vault),
+        "file_size": lambda: os.path.getsize(filepath),
+        "bytes_per_key": lambda: bytes_per_key(read_only=True),
+        "bytes_per_key_frozen": lambda: bytes_per_key(frozen=True),
+    }
+    return {name: measures[name]() for name in benchmarks}
+
+
+def run(sizes, depths, formats, benchmarks):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for file_format in formats:
+            for num_keys in sizes:
+                for depth in depths:
+                    start = time.perf_counter()
+                    measured = run_case(tmp, file_format, num_keys, depth, benchmarks)
+                    print(
+                        f"{file_format} {num_keys} keys depth {depth}: "
+                        f"{time.perf_counter() - start:.1f}s",
+                        file=sys.stderr,
+                    )
+                    results.extend(
+                        {
+                            "benchmark": name,
+                            "format": file_format,
+                            "keys": num_keys,
+                            "depth": depth,
+                            "value": value,
+                            "unit": BENCHMARKS[name][0],
+                        }
+                        for name, value in measured.items()
+                    )
+    return {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def case_id(result):
+    return (result["benchmark"], result["format"], result["keys"], result["depth"])
+
+
+def compare(report, baseline, thresholds):
+    """
+    Return the results that are slower or larger than the baseline by more than their
+    threshold, as (result, baseline value, change) tuples.
+    """
+    previous = {case_id(r): r["value"] for r in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        base = previous.get(case_id(result))
+        if not base:
+            continue
+        change = result["value"] / base - 1
+        threshold = thresholds.get(result["benchmark"], thresholds[None])
+        if change > threshold:
+            regressions.append((result, base, change))
+    return regressions
+
+
+def format_value(value, unit):
+    if unit == "B":
+        return human_bytes(value)
+    if value < 1e-3:
+        return f"{value * 1e6:.2f} us"
+    return f"{value * 1000:.2f} ms"
+
+
+def parse_list(value, type=str):
+    return [type(v) for v in value.split(",") if v]
+
+
+def parse_thresholds(values):
+    """
+    Parse --threshold values, either a default ratio (0.25) or BENCHMARK=RATIO.
+    """
+    thresholds = {None: DEFAULT_THRESHOLD}
+    for value in values:
+        name, sep, ratio = value.rpartition("=")
+        if sep and name not in BENCHMARKS:
+            raise SystemExit(f"Unknown benchmark in threshold: {name}")
+        thresholds[name or None] = float(ratio)
+    return thresholds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=lambda v: parse_list(v, int), default=SIZES)
+    parser.add_argument("--depths", type=lambda v: parse_list(v, int), default=DEPTHS)
+    parser.add_argument("--formats", type=parse_list, default=FORMATS)
+    parser.add_argument(
+        "--benchmarks", type=parse_list, default=list(BENCHMARKS), help="Subset to run"
+    )
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare the results against this file")
+    parser.add_argument("--save-baseline", help="Write the results as the new baseline")
+    parser.add_argument(
+        "--threshold",
+        action="append",
+        default=[],
+        help=f"Allowed slowdown ratio, eg. 0.25 or load=0.5 (default {DEFAULT_THRESHOLD})",
+    )
+    args = parser.parse_args(argv)
+    thresholds = parse_thresholds(args.threshold)
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    report = run(args.sizes, args.depths, args.formats, args.benchmarks)
+    print_table(
+        ["benchmark", "format", "keys", "depth", "result"],
+        [(*case_id(r), format_value(r["value"], r["unit"])) for r in report["results"]],
+    )
+    for filepath in filter(None, (args.output, args.save_baseline)):
+        with open(filepath, "w") as fout:
+            json.dump(report, fout, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as fin:
+            baseline = json.load(fin)
+        regressions = compare(report, baseline, thresholds)
+        for result, base, change in regressions:
+            print(
+                f"REGRESSION {' '.join(map(str, case_id(result)))}: "
+                f"{format_value(base, result['unit'])} -> "
+                f"{format_value(result['value'], result['unit'])} (+{change:.0%})"
+            )
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,16 @@
 from secrets_vault.vault import SecretsVault
-from secrets_vault.version import __version__
 
-__all__ = ["SecretsVault", "__version__"]
+__all__ = ["SecretsVault", "AsyncSecretsVault", "__version__"]
+
+
+def __getattr__(name):
+    if name == "AsyncSecretsVault":
+        # imports asyncio, only needed by async applications
+        from secrets_vault.aio import AsyncSecretsVault
+
+        return AsyncSecretsVault
+    if name == "__version__":
+        from secrets_vault import version
+
+        return version.__version__
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,10 +1,19 @@
+import contextlib
 import json
 import logging
+import os
 from io import BytesIO
 
 import click
 
-from secrets_vault import SecretsVault, exceptions, constants, __version__, formatters
+from secrets_vault import (
+    SecretsVault,
+    backends,
+    exceptions,
+    constants,
+    formatters,
+    instrumentation,
+)
 
 
 def serialize(v, format="yaml"):
@@ -38,8 +47,9 @@ def serialize(v, format="yaml"):
 @click.option(
     "-s",
     "--secrets-filepath",
-    default=constants.DEFAULT_SECRETS_FILEPATH,
-    help="Path to the encrypted secrets vault.",
+    default=[constants.DEFAULT_SECRETS_FILEPATH],
+    multiple=True,
+    help="Path to the encrypted secrets vault. Repeat it to read a layered view of several vaults, where later ones override earlier ones.",
     show_default=True,
 )
 @click.option(
@@ -63,28 +73,67 @@ def serialize(v, format="yaml"):
     is_flag=True,
     help="Enable verbose output.",
 )
+@click.option(
+    "--agent-socket",
+    envvar="SECRETS_VAULT_AGENT_SOCKET",
+    help="Unix socket of the `secrets serve` agent. Defaults to a per-user path derived from the secrets filepath.",
+)
+@click.option(
+    "--no-agent",
+    is_flag=True,
+    envvar="SECRETS_VAULT_NO_AGENT",
+    help="Always decrypt the vault directly, even if an agent is serving it.",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Print the time and bytes processed by every phase (read, decrypt, parse...) to stderr after the command.",
+)
 @click.pass_context
 def cli(ctx, **kwargs):
+    filepaths = kwargs["secrets_filepath"]
+    kwargs["secrets_filepath"] = (
+        filepaths[0] if len(filepaths) == 1 else list(filepaths)
+    )
     ctx.obj = kwargs
     logging.basicConfig(level=logging.INFO if kwargs["verbose"] else logging.ERROR)
+    if kwargs["profile"]:
+        profile = instrumentation.add_hook(instrumentation.Profile())
+
+        def report():
+            instrumentation.remove_hook(profile)
+            click.echo(profile.report(), err=True)
+
+        ctx.call_on_close(report)
 
 
 @cli.command(help="Show the package version.")
 @click.pass_context
 def version(ctx):
+    from secrets_vault import __version__
+
     click.echo(f"secrets-vault v{__version__}")
 
 
 @cli.command(
     help="Generate a new secrets vault and master.key pair. If a secrets vault already exists, this will abort."
 )
+@click.option(
+    "--container",
+    default="text",
+    type=click.Choice(["text", "binary", "segmented", "entries", "journal"]),
+    help="Encrypted container. 'binary' stores raw ciphertext instead of base64 text, 'segmented' splits large vaults into authenticated segments that are decrypted in parallel, 'entries' encrypts every top-level entry on its own, 'journal' appends every change as a small encrypted delta.",
+    show_default=True,
+)
 @click.pass_context
-def init(ctx):
+def init(ctx, container):
+    require_single_vault(ctx)
     try:
         SecretsVault.create(
             secrets_filepath=ctx.obj["secrets_filepath"],
             master_key_filepath=ctx.obj["master_key_filepath"],
             file_format=ctx.obj["format"],
+            container=container,
         )
         click.echo(f"Generated new secrets vault at {ctx.obj['secrets_filepath']}")
         click.echo(
@@ -95,45 +144,190 @@ def init(ctx):
         exit(1)
 
 
-def with_vault(ctx, func):
+def with_vault(ctx, func, read_only=False, lock=False):
+    """
+    Open the vault and call func with it. With lock=True, the vault lock is held from
+    loading the vault until func returns, so concurrent commands don't lose updates.
+    """
+    from secrets_vault.files import file_lock
+
+    if lock:
+        require_single_vault(ctx)
     try:
-        vault = SecretsVault(
-            secrets_filepath=ctx.obj["secrets_filepath"],
-            master_key_filepath=ctx.obj["master_key_filepath"],
-            file_format=ctx.obj["format"],
-        )
-        func(vault)
+        # a missing vault is reported by SecretsVault, don't leave a lock file behind for it
+        lock = lock and os.path.exists(ctx.obj["secrets_filepath"])
+        with (
+            file_lock(ctx.obj["secrets_filepath"]) if lock else contextlib.nullcontext()
+        ):
+            vault = SecretsVault.open(
+                secrets_filepath=ctx.obj["secrets_filepath"],
+                master_key_filepath=ctx.obj["master_key_filepath"],
+                file_format=ctx.obj["format"],
+                read_only=read_only,
+            )
+            func(vault)
     except (
         exceptions.MasterKeyNotFound,
         exceptions.SecretsFileNotFound,
         exceptions.MasterKeyInvalid,
         exceptions.MalformedSecretsFile,
+        exceptions.SecretsConflict,
     ) as e:
         click.echo(str(e))
         exit(1)
 
 
+def require_single_vault(ctx):
+    if isinstance(ctx.obj["secrets_filepath"], list):
+        raise click.UsageError(
+            f"`{ctx.info_name}` works on a single vault, pass only one --secrets-filepath"
+        )
+
+
+def ask_agent(ctx, op, **params):
+    """
+    Send a request to the agent serving the vault, or return None to read the vault directly.
+    """
+    if ctx.obj["no_agent"] or isinstance(ctx.obj["secrets_filepath"], list):
+        return None
+    from secrets_vault import agent
+
+    started = instrumentation.start()
+    try:
+        response = agent.request(
+            ctx.obj["secrets_filepath"],
+            ctx.obj["format"],
+            op,
+            path=ctx.obj["agent_socket"],
+            **params,
+        )
+        instrumentation.emit("agent", started)
+        return response
+    except exceptions.AgentUnavailable as e:
+        logging.getLogger(__name__).info(str(e))
+        return None
+
+
 @cli.command(
-    help="Get a secret value. If no specific key is provided, all secrets are printed."
+    help="Get secret values. KEYS are dotted paths or glob patterns over them (eg. 'aws.*'), all read from a single load. If no key is provided, all secrets are printed."
+)
+@click.argument("keys", nargs=-1)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Choice(["value", "json", "jsonl"]),
+    default="value",
+    show_default=True,
+    help="Print every value on its own, a single JSON object of all keys, or a JSON object per line.",
+)
+@click.option(
+    "--strict",
+    is_flag=True,
+    help="Fail if a key is missing or a pattern matches nothing, instead of skipping it.",
 )
-@click.argument("key", required=False)
 @click.pass_context
-def get(ctx, key):
+def get(ctx, keys, output, strict):
     fformat = ctx.obj["format"]
 
-    def handler(vault):
-        if key:
-            result = vault.get(key, default="")
-        else:
-            result = vault.secrets
+    if not keys and output == "value":
+        # dumping the whole vault keeps the round-trip loader so comments are printed too
+        with_vault(ctx, lambda vault: click.echo(serialize(vault.secrets, fformat)))
+        return
 
-        click.echo(serialize(result, fformat))
+    pairs = select_secrets(ctx, keys or ["*"])
+    missing = [key for key, value in pairs if value is constants.UNSET]
+    if strict and missing:
+        for key in missing:
+            click.echo(f"Secret {key} not found in secrets vault", err=True)
+        exit(1)
 
-    with_vault(ctx, handler)
+    if output == "json":
+        values = {k: v for k, v in pairs if v is not constants.UNSET}
+        click.echo(json.dumps(values, indent=2, default=str))
+    elif output == "jsonl":
+        for key, value in pairs:
+            if value is not constants.UNSET:
+                click.echo(json.dumps({"key": key, "value": value}, default=str))
+    else:
+        for _, value in pairs:
+            # a missing key prints an empty line, so values stay in the order of keys
+            click.echo(serialize("" if value is constants.UNSET else value, fformat))
+
+
+def select_secrets(ctx, keys):
+    """
+    (key, value) pairs for the keys and patterns of `get`, from the agent or the vault.
+    Missing keys have the value UNSET.
+    """
+    response = ask_agent(ctx, "get_many", keys=list(keys))
+    if response is not None:
+        return [
+            (item["key"], item["value"] if item["found"] else constants.UNSET)
+            for item in response["value"]
+        ]
+    pairs = []
+    with_vault(ctx, lambda vault: pairs.extend(vault._select(keys)), read_only=True)
+    return pairs
+
+
+def parse_target(target):
+    """
+    Parse an `envify` target: KEY=OUTPUT renders KEY to OUTPUT, a bare OUTPUT renders all
+    secrets.
+    """
+    key, sep, output = target.rpartition("=")
+    if not output or (sep and not key):
+        raise click.BadParameter(f"Expected KEY=OUTPUT or OUTPUT, got {target!r}")
+    return key or None, output
+
+
+def env_values(vault, key):
+    """
+    The secrets `envify` renders for key: all secrets, the entries of a dict, or the key
+    itself.
+    """
+    if key is None:
+        return vault.secrets
+    value = vault.get(key)
+    return value if isinstance(value, dict) else {key: value}
+
+
+def env_items(values, raw=False):
+    """
+    Environment variable names and values for secrets, as rendered by `envify` and `run`.
+    """
+    for k, v in values.items():
+        name = k if raw else k.upper().replace("-", "_")
+        yield name, serialize(v, "dotenv")
+
+
+def env_lines(values, export=False, raw=False):
+    prefix = "export " if export else ""
+    for name, value in env_items(values, raw):
+        yield f"{prefix}{name}={value}"
+
+
+def write_env(lines, output):
+    """
+    Write env lines to stdout, or atomically replace the dotenv file output with them.
+    """
+    from secrets_vault.files import atomic_write
+
+    if output == "stdout":
+        for line in lines:
+            click.echo(line)
+        return
+    if output == "dotenv":
+        output = ".env"
+    with atomic_write(output, "w") as fout:
+        fout.write("# generated by secrets-vault")
+        for line in lines:
+            fout.write("\n")
+            fout.write(line)
 
 
 @cli.command(
-    help="Prints a secret as an environment variable (eg. KEY=value). If no specific key is provided, all secrets are printed."
+    help="Prints a secret as an environment variable (eg. KEY=value). If no specific key is provided, all secrets are printed. Use --target or --manifest to render several dotenv files from a single decryption."
 )
 @click.argument("key", required=False)
 @click.option(
@@ -148,44 +342,89 @@ def get(ctx, key):
     default="stdout",
     help="Output the result to stdout or a given dotenv file. For example --output .env.staging",
 )
+@click.option(
+    "-t",
+    "--target",
+    "targets",
+    multiple=True,
+    help="Render a secret to a dotenv file, as KEY=OUTPUT, or all secrets as OUTPUT. Can be repeated. For example -t web=.env.web -t worker=.env.worker",
+)
+@click.option(
+    "--manifest",
+    type=click.File("r"),
+    help="Read targets from a file, one KEY=OUTPUT or OUTPUT per line. Use - for stdin. Empty lines and # comments are ignored.",
+)
 @click.option(
     "--raw",
     is_flag=True,
     help="When raw mode is enabled, the key=value is printed as stored on the vault.",
 )
 @click.pass_context
-def envify(ctx, key, export, output, raw):
-    def serialize_key(k):
-        return k if raw else k.upper().replace("-", "_")
-
-    def write(obj):
-        serialized = [
-            f"{'export ' if export else ''}{serialize_key(k)}={serialize(v, 'dotenv')}"
-            for k, v in obj.items()
-        ]
-        if output == "stdout":
-            for line in serialized:
-                click.echo(line)
-        elif output == "dotenv":
-            with open(".env", "w") as f:
-                f.write("# generated by secrets-vault\n")
-                f.write("\n".join(serialized))
-        else:
-            with open(output, "w") as f:
-                f.write("# generated by secrets-vault\n")
-                f.write("\n".join(serialized))
+def envify(ctx, key, export, output, targets, manifest, raw):
+    jobs = [parse_target(target) for target in targets]
+    if manifest:
+        for line in manifest:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                jobs.append(parse_target(line))
+    if jobs and (key or output != "stdout"):
+        raise click.UsageError("KEY and --output cannot be combined with targets")
+    jobs = jobs or [(key, output)]
+
+    # look everything up before writing, so a failure leaves no file half updated
+    responses = []
+    for key, _ in jobs:
+        response = ask_agent(ctx, "envify", key=key)
+        if response is None:
+            break
+        responses.append(response["value"])
+    if len(responses) == len(jobs):
+        for (_, output), values in zip(jobs, responses):
+            write_env(env_lines(values, export, raw), output)
+        return
 
     def handler(vault):
-        if key:
-            value = vault.get(key)
-            if isinstance(value, dict):
-                write(value)
-            else:
-                write({key: value})
-        else:
-            write(vault.secrets)
+        for key, output in jobs:
+            write_env(env_lines(env_values(vault, key), export, raw), output)
 
-    with_vault(ctx, handler)
+    with_vault(ctx, handler, read_only=True)
+
+
+@cli.command(
+    help="Run a command with the secrets as environment variables, using the same names and values as `envify`. For example: `secrets run -k web -- gunicorn app:app`",
+    context_settings={"allow_interspersed_args": False},
+)
+@click.option(
+    "-k",
+    "--key",
+    help="Only pass this secret, or the entries of this dict, instead of all secrets.",
+)
+@click.option(
+    "--raw",
+    is_flag=True,
+    help="When raw mode is enabled, variables are named as the keys stored on the vault.",
+)
+@click.argument("command", nargs=-1, required=True, type=click.UNPROCESSED)
+@click.pass_context
+def run(ctx, key, raw, command):
+    values = []
+    response = ask_agent(ctx, "envify", key=key)
+    if response is not None:
+        values.append(response["value"])
+    else:
+        with_vault(
+            ctx, lambda vault: values.append(env_values(vault, key)), read_only=True
+        )
+
+    env = {**os.environ, **dict(env_items(values[0], raw))}
+    # exec doesn't return, so run the close callbacks now to print the --profile report
+    ctx.find_root().close()
+    # replace this process, the secrets never touch the disk or a shell
+    try:
+        os.execvpe(command[0], command, env)
+    except OSError as e:
+        click.echo(f"Could not run {command[0]}: {e.strerror}", err=True)
+        exit(127)
 
 
 @cli.command(
@@ -199,7 +438,72 @@ def set(ctx, key, value):
         vault.set(key, value)
         vault.save()
 
-    with_vault(ctx, handler)
+    with_vault(ctx, handler, lock=True)
+
+
+@cli.command(
+    help="Fold the appended changes of a journal vault into a new snapshot, or convert a vault to the journal container."
+)
+@click.pass_context
+def compact(ctx):
+    def handler(vault):
+        vault.container = backends.CONTAINER_JOURNAL
+        vault.compact()
+
+    with_vault(ctx, handler, lock=True)
+
+
+def parse_operation(op):
+    """
+    Parse a `set-many` operation: KEY=VALUE stores a secret and !KEY deletes it.
+    """
+    if op.startswith("!") and len(op) > 1:
+        return "del", op[1:], None
+    key, sep, value = op.partition("=")
+    if not sep or not key:
+        raise click.BadParameter(f"Expected KEY=VALUE or !KEY, got {op!r}")
+    return "set", key, value
+
+
+@cli.command(
+    "set-many",
+    help="Store and delete many secrets with a single write. Operations are KEY=VALUE to store a secret or !KEY to delete it. For example: `secrets set-many foo=bar baz=qux -d old`",
+)
+@click.argument("operations", nargs=-1)
+@click.option(
+    "-d",
+    "--delete",
+    "deletes",
+    multiple=True,
+    help="Delete a secret, can be repeated.",
+)
+@click.option(
+    "-i",
+    "--input",
+    "input_file",
+    type=click.File("r"),
+    help="Read operations from a file, one per line. Use - for stdin. Empty lines and # comments are ignored.",
+)
+@click.pass_context
+def set_many(ctx, operations, deletes, input_file):
+    ops = []
+    if input_file:
+        for line in input_file:
+            line = line.rstrip("\r\n")
+            if line.strip() and not line.lstrip().startswith("#"):
+                ops.append(parse_operation(line))
+    ops.extend(parse_operation(op) for op in operations)
+    ops.extend(("del", key, None) for key in deletes)
+
+    def handler(vault):
+        with vault.batch():
+            for action, key, value in ops:
+                if action == "set":
+                    vault.set(key, value)
+                else:
+                    vault.delete(key)
+
+    with_vault(ctx, handler, lock=True)
 
 
 @cli.command("del", help="Delete a secret. For example: `secrets del foo`")
@@ -210,7 +514,268 @@ def delete(ctx, key):
         vault.delete(key)
         vault.save()
 
-    with_vault(ctx, handler)
+    with_vault(ctx, handler, lock=True)
+
+
+@cli.command(
+    help="Run an agent that keeps the decrypted vault in memory and serves `get` and `envify` over a Unix socket, until interrupted."
+)
+@click.pass_context
+def serve(ctx):
+    import asyncio
+
+    from secrets_vault.agent import SecretsAgent
+
+    require_single_vault(ctx)
+
+    def open_vault():
+        return SecretsVault(
+            secrets_filepath=ctx.obj["secrets_filepath"],
+            master_key_filepath=ctx.obj["master_key_filepath"],
+            file_format=ctx.obj["format"],
+            # the agent keeps the vault in memory, the compact frozen tree is enough for reads
+            frozen=True,
+        )
+
+    try:
+        agent = SecretsAgent(
+            open_vault,
+            ctx.obj["secrets_filepath"],
+            ctx.obj["format"],
+            path=ctx.obj["agent_socket"],
+        )
+        asyncio.run(
+            agent.serve(ready=lambda: click.echo(f"Serving secrets on {agent.path}"))
+        )
+    except KeyboardInterrupt:
+        pass
+    except (
+        exceptions.MasterKeyNotFound,
+        exceptions.SecretsFileNotFound,
+        exceptions.MasterKeyInvalid,
+        exceptions.MalformedSecretsFile,
+        exceptions.AgentUnavailable,
+        PermissionError,
+    ) as e:
+        click.echo(str(e))
+        exit(1)
+
+
+@cli.command(
+    help="Re-encrypt vaults with a new master key. PATHS are vault files, or directories searched for vaults, and default to the vault given with -s. The current key is read as usual, from -m or MASTER_KEY."
+)
+@click.argument("paths", nargs=-1, type=click.Path(exists=True))
+@click.option(
+    "-n",
+    "--new-master-key-filepath",
+    required=True,
+    help="File with the new master key. If it does not exist, a new key is generated and written to it.",
+)
+@click.option(
+    "--pattern",
+    default="*.enc",
+    help="Vault files to rotate in directories.",
+    show_default=True,
+)
+@click.option("-w", "--workers", type=int, help="Number of vaults rotated in parallel.")
+@click.pass_context
+def rotate(ctx, paths, new_master_key_filepath, pattern, workers):
+    from secrets_vault.maintenance import rotate_master_key
+
+    if not paths:
+        paths = ctx.obj["secrets_filepath"]
+        paths = paths if isinstance(paths, list) else [paths]
+    try:
+        old_master_key = SecretsVault._load_master_key(ctx.obj["master_key_filepath"])
+    except exceptions.MasterKeyNotFound as e:
+        click.echo(str(e))
+        exit(1)
+
+    if os.path.exists(new_master_key_filepath):
+        with open(new_master_key_filepath) as fin:
+            new_master_key = fin.read().strip()
+    else:
+        new_master_key = constants.DEFAULT_BACKEND.generate_master_key()
+        filedesc = os.open(new_master_key_filepath, os.O_WRONLY | os.O_CREAT, 0o600)
+        with open(filedesc, "w") as fout:
+            fout.write(new_master_key)
+        click.echo(
+            f"Generated new master key at {new_master_key_filepath} - keep it safe!"
+        )
+    if new_master_key == old_master_key:
+        raise click.UsageError("The new master key is the same as the current one")
+
+    try:
+        report = rotate_master_key(
+            paths, old_master_key, new_master_key, workers=workers, pattern=pattern
+        )
+    except exceptions.MasterKeyInvalid as e:
+        click.echo(str(e))
+        exit(1)
+    for filepath, error in report.failed:
+        click.echo(f"Could not rotate {filepath}: {error}", err=True)
+    click.echo(report.summary())
+    if report.failed:
+        exit(1)
+
+
+@cli.command(
+    help="Check that vaults decrypt and parse, eg. in CI. PATHS are vault files, or directories searched for vaults, and default to the vault given with -s. Exits with an error if any vault fails."
+)
+@click.argument("paths", nargs=-1, type=click.Path(exists=True))
+@click.option(
+    "--pattern",
+    default="*.enc",
+    help="Vault files to check in directories.",
+    show_default=True,
+)
+@click.option(
+    "--key-filename",
+    help="Use the nearest file with this name in the directory of each vault or its parents as its master key, eg. master.key. Vaults without one use the current master key.",
+)
+@click.option("-w", "--workers", type=int, help="Number of vaults checked in parallel.")
+@click.option(
+    "-o",
+    "--output",
+    default="text",
+    type=click.Choice(["text", "json"]),
+    help="Print a line per vault, or a JSON report.",
+    show_default=True,
+)
+@click.pass_context
+def check(ctx, paths, pattern, key_filename, workers, output):
+    from click.core import ParameterSource
+
+    from secrets_vault.maintenance import check_vaults
+
+    if not paths:
+        paths = ctx.obj["secrets_filepath"]
+        paths = paths if isinstance(paths, list) else [paths]
+    try:
+        master_key = SecretsVault._load_master_key(ctx.obj["master_key_filepath"])
+    except exceptions.MasterKeyNotFound as e:
+        if not key_filename:
+            click.echo(str(e))
+            exit(1)
+        master_key = None
+
+    def key_for(filepath):
+        directory = os.path.dirname(os.path.abspath(filepath))
+        while True:
+            candidate = os.path.join(directory, key_filename)
+            if os.path.isfile(candidate):
+                with open(candidate) as fin:
+                    return fin.read().strip()
+            if os.path.dirname(directory) == directory:
+                return master_key
+            directory = os.path.dirname(directory)
+
+    # the format is guessed from every file name unless it was given explicitly
+    explicit = ctx.parent.get_parameter_source("format") != ParameterSource.DEFAULT
+    report = check_vaults(
+        paths,
+        key_for if key_filename else master_key,
+        workers=workers,
+        pattern=pattern,
+        file_format=ctx.obj["format"] if explicit else None,
+    )
+
+    if output == "json":
+        click.echo(json.dumps(report.as_dict(), indent=2))
+    else:
+        for result in report.results:
+            if result["ok"]:
+                click.echo(
+                    f"ok      {result['path']} ({result['container']}, "
+                    f"{result['keys']} keys, {result['size']} bytes, "
+                    f"{result['seconds'] * 1000:.1f} ms)"
+                )
+            else:
+                click.echo(
+                    f"FAILED  {result['path']}: {result['error_type']}: {result['error']}"
+                )
+        click.echo(report.summary())
+    if report.failed:
+        exit(1)
+
+
+def git_show(revision, filepath):
+    """
+    Contents of filepath at a git revision, read into memory.
+    """
+    import subprocess
+
+    directory, filename = os.path.split(os.path.abspath(filepath))
+    result = subprocess.run(
+        ["git", "show", f"{revision}:./{filename}"],
+        cwd=directory,
+        capture_output=True,
+    )
+    if result.returncode != 0:
+        raise click.ClickException(result.stderr.decode().strip())
+    return result.stdout
+
+
+def load_version(vault, version):
+    """
+    Load a vault file, or a REV:PATH git revision of one, with the settings of vault.
+    """
+    if version is None:
+        return vault
+    if os.path.exists(version):
+        return SecretsVault(
+            master_key=vault.master_key,
+            secrets_filepath=version,
+            file_format=vault.file_format,
+            read_only=True,
+        )
+    revision, sep, filepath = version.partition(":")
+    if not sep:
+        raise click.BadParameter(f"{version} is neither a file nor a REV:PATH revision")
+    return vault._sibling(git_show(revision, filepath or vault.secrets_filename))
+
+
+@cli.command(
+    help="Show the keys added, removed and changed between two versions of a vault. OLD and NEW are vault files, or git revisions as REV:PATH with PATH relative to the current directory (eg. HEAD~1:secrets.yml.enc, or HEAD~1: for the vault given with -s). OLD defaults to HEAD: and NEW to the vault given with -s. Values are masked unless --show-values is given."
+)
+@click.argument("old", required=False, default="HEAD:")
+@click.argument("new", required=False)
+@click.option("--show-values", is_flag=True, help="Print the values of changed keys.")
+@click.option(
+    "--exit-code",
+    is_flag=True,
+    help="Exit with 1 if there are differences, like git diff --exit-code.",
+)
+@click.pass_context
+def diff(ctx, old, new, show_values, exit_code):
+    require_single_vault(ctx)
+    changes = []
+
+    def handler(vault):
+        changes.extend(load_version(vault, old).diff(load_version(vault, new)))
+
+    with_vault(ctx, handler, read_only=True)
+
+    styles = {
+        "added": ("+", "green"),
+        "removed": ("-", "red"),
+        "changed": ("~", "yellow"),
+    }
+    for change, path, before, after in changes:
+        symbol, color = styles[change]
+        line = f"{symbol} {path}"
+        if show_values:
+            if change == "added":
+                line += f": {serialize(after, 'dotenv')}"
+            elif change == "removed":
+                line += f": {serialize(before, 'dotenv')}"
+            else:
+                line += (
+                    f": {serialize(before, 'dotenv')} -> {serialize(after, 'dotenv')}"
+                )
+        click.echo(click.style(line, fg=color))
+    if exit_code and changes:
+        exit(1)
 
 
 @cli.command(help="Open the secrets vault in your configured $EDITOR.")
@@ -219,7 +784,7 @@ def edit(ctx):
     def handler(vault):
         vault.edit_secrets()
 
-    with_vault(ctx, handler)
+    with_vault(ctx, handler, lock=True)
 
 
 if __name__ == "__main__":
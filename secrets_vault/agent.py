@@ -0,0 +1,281 @@
+"""
+Agent that keeps a decrypted vault in memory and answers lookups over a Unix socket, so
+short-lived processes don't pay for decrypting and parsing the vault on every run.
+
+The protocol is one JSON object per line in both directions. Requests carry an "op"
+(ping, get, get_many, list or envify) and the vault "path" and "format" they expect, responses
+are {"ok": true, ...} or {"ok": false, "error": "..."}.
+
+Like ssh-agent, anyone who can connect to the socket can read the secrets. The socket is
+created 0600 inside a 0700 directory owned by the current user, connections from other
+users are rejected, and clients refuse sockets they don't own.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import signal
+import socket
+import stat
+import struct
+
+from secrets_vault import constants, exceptions
+from secrets_vault.files import file_identity
+from secrets_vault.index import KeyIndex
+
+log = logging.getLogger(__name__)
+
+SOCKET_DIRNAME = "secrets-vault"
+# how long a client waits for the agent before decrypting the vault itself
+CLIENT_TIMEOUT = 2.0
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+
+
+def socket_path(secrets_filepath) -> str:
+    """
+    Default socket of the agent serving secrets_filepath, unique per user and vault file.
+    """
+    import hashlib
+
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        directory = os.path.join(runtime_dir, SOCKET_DIRNAME)
+    else:
+        directory = os.path.join("/tmp", f"{SOCKET_DIRNAME}-{os.getuid()}")
+    name = hashlib.sha256(_vault_path(secrets_filepath).encode()).hexdigest()[:16]
+    return os.path.join(directory, f"{name}.sock")
+
+
+class SecretsAgent:
+    """
+    Serve a single vault over a Unix socket. The vault is opened read-only and reopened
+    when the file on disk changes; every reload swaps in a new vault so requests in flight
+    keep a consistent view.
+    """
+
+    def __init__(self, open_vault, secrets_filepath, file_format, path=None):
+        _require_support()
+        self.open_vault = open_vault
+        self.secrets_filepath = _vault_path(secrets_filepath)
+        self.file_format = file_format
+        self.path = path or socket_path(secrets_filepath)
+        self.vault = None
+        self._stat = None
+        self._server = None
+        self._reload_lock = None
+
+    async def serve(self, ready=None):
+        """
+        Load the vault and serve requests until stop() is called or the task is cancelled.
+        """
+        import asyncio
+
+        self._reload_lock = asyncio.Lock()
+        self._stat = file_identity(self.secrets_filepath)
+        self.vault = self.open_vault()
+
+        _prepare_socket_dir(os.path.dirname(self.path))
+        _remove_stale_socket(self.path)
+        umask = os.umask(0o177)
+        try:
+            self._server = await asyncio.start_unix_server(
+                self._handle_client, path=self.path, limit=MAX_MESSAGE_SIZE
+            )
+        finally:
+            os.umask(umask)
+        os.chmod(self.path, 0o600)
+        log.info(f"Serving {self.secrets_filepath} on {self.path}")
+        with contextlib.suppress(ValueError, RuntimeError, NotImplementedError):
+            # only possible from the main thread, remove the socket on kill too
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, self.stop)
+
+        try:
+            async with self._server:
+                if ready is not None:
+                    ready()
+                await self._server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.path)
+
+    def stop(self):
+        if self._server is not None:
+            self._server.close()
+
+    async def handle(self, request) -> dict:
+        if request.get("path") != self.secrets_filepath:
+            return _error(f"This agent serves {self.secrets_filepath}")
+        if request.get("format") != self.file_format:
+            return _error(f"This agent serves a {self.file_format} vault")
+
+        vault = await self._current_vault()
+        op = request.get("op")
+        if op == "ping":
+            return {"ok": True}
+        if op == "get":
+            key = request.get("key")
+            if key is None:
+                return {"ok": True, "found": True, "value": vault.secrets}
+            value = vault.get(key, default=_MISSING)
+            if value is _MISSING:
+                return {"ok": True, "found": False}
+            return {"ok": True, "found": True, "value": value}
+        if op == "get_many":
+            return {
+                "ok": True,
+                "value": [
+                    {"key": key, "found": False}
+                    if value is constants.UNSET
+                    else {"key": key, "found": True, "value": value}
+                    for key, value in vault._select(request.get("keys") or [])
+                ],
+            }
+        if op == "list":
+            # frozen vaults keep no index, build a throwaway one
+            index = KeyIndex(vault.secrets) if vault.frozen else vault._get_index()
+            paths = [
+                path
+                for path in index.paths()
+                if not isinstance(index.get(path), (dict, list, tuple))
+            ]
+            return {"ok": True, "value": paths}
+        if op == "envify":
+            key = request.get("key")
+            if key is None:
+                return {"ok": True, "value": vault.secrets}
+            value = vault.get(key)
+            return {
+                "ok": True,
+                "value": value if isinstance(value, dict) else {key: value},
+            }
+        return _error(f"Unknown op {op!r}")
+
+    async def _current_vault(self):
+        import asyncio
+
+        identity = file_identity(self.secrets_filepath)
+        if identity == self._stat:
+            return self.vault
+        async with self._reload_lock:
+            identity = file_identity(self.secrets_filepath)
+            if identity != self._stat:
+                try:
+                    self.vault = await asyncio.to_thread(self.open_vault)
+                    self._stat = identity
+                    log.info(f"Reloaded {self.secrets_filepath}")
+                except (exceptions.SecretsStoreException, OSError) as e:
+                    # keep serving the last good copy, the file may be replaced again
+                    log.error(f"Could not reload {self.secrets_filepath}: {e}")
+        return self.vault
+
+    async def _handle_client(self, reader, writer):
+        try:
+            if not _same_user(writer.get_extra_info("socket")):
+                log.warning("Rejected connection from another user")
+                return
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    response = await self.handle(request)
+                except (ValueError, AttributeError) as e:
+                    response = _error(f"Invalid request: {e}")
+                writer.write(json.dumps(response, default=str).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, ValueError) as e:
+            log.info(f"Dropped client connection: {e}")
+        finally:
+            writer.close()
+
+
+def request(secrets_filepath, file_format, op, path=None, **params):
+    """
+    Send a single request to the agent serving secrets_filepath and return its response.
+    Raises AgentUnavailable if no trusted agent answers, callers then read the vault directly.
+    """
+    _require_support()
+    path = path or socket_path(secrets_filepath)
+    try:
+        _check_owner(os.path.dirname(path), private=True)
+        _check_owner(path)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(CLIENT_TIMEOUT)
+            sock.connect(path)
+            message = {
+                "op": op,
+                "path": _vault_path(secrets_filepath),
+                "format": file_format,
+                **params,
+            }
+            sock.sendall(json.dumps(message).encode() + b"\n")
+            with sock.makefile("rb") as fin:
+                line = fin.readline(MAX_MESSAGE_SIZE)
+        response = json.loads(line)
+    except (OSError, ValueError) as e:
+        raise exceptions.AgentUnavailable(f"No agent available at {path}: {e}")
+    if not response.get("ok"):
+        raise exceptions.AgentUnavailable(response.get("error", "Agent request failed"))
+    return response
+
+
+_MISSING = object()
+
+
+def _error(message):
+    return {"ok": False, "error": message}
+
+
+def _require_support():
+    if not hasattr(socket, "AF_UNIX") or not hasattr(os, "getuid"):
+        raise exceptions.AgentUnavailable(
+            "The agent needs Unix sockets and user ids, not available on this platform"
+        )
+
+
+def _vault_path(secrets_filepath) -> str:
+    return os.path.realpath(os.fspath(secrets_filepath))
+
+
+def _prepare_socket_dir(directory):
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    _check_owner(directory, private=True)
+
+
+def _remove_stale_socket(path):
+    if not os.path.exists(path):
+        return
+    _check_owner(path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except ConnectionRefusedError:
+            # left behind by an agent that did not shut down cleanly
+            os.remove(path)
+            return
+    raise exceptions.AgentUnavailable(f"An agent is already serving on {path}")
+
+
+def _check_owner(path, private=False):
+    st = os.lstat(path)
+    if st.st_uid != os.getuid():
+        raise PermissionError(f"{path} is owned by another user")
+    if private and (not stat.S_ISDIR(st.st_mode) or st.st_mode & 0o077):
+        raise PermissionError(
+            f"{path} must be a directory only accessible by its owner"
+        )
+
+
+def _same_user(sock) -> bool:
+    if not hasattr(socket, "SO_PEERCRED"):
+        # no peer credentials on this platform, the socket permissions still apply
+        return True
+    creds = sock.getsockopt(
+        socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+    )
+    _, uid, _ = struct.unpack("3i", creds)
+    return uid == os.getuid()
@@ -0,0 +1,123 @@
+import asyncio
+import inspect
+import os
+
+from secrets_vault.vault import SecretsVault
+
+# loads in flight, keyed by event loop and open() arguments, so concurrent opens of the
+# same vault decrypt it only once
+_inflight = {}
+
+
+class AsyncSecretsVault:
+    """
+    Asyncio counterpart of SecretsVault. Reading, decrypting and parsing the file, and
+    encrypting and writing it on save, run in an executor so the event loop keeps serving
+    requests. Lookups and changes happen in memory and are the same as SecretsVault.
+
+        vault = await AsyncSecretsVault.open(secrets_filepath="./secrets.yml.enc")
+        value = await vault.get("database-url")
+    """
+
+    def __init__(self, vault, arguments, executor=None):
+        self.vault = vault
+        self.executor = executor
+        self._arguments = arguments
+        self._save_lock = asyncio.Lock()
+
+    @classmethod
+    async def open(cls, *args, executor=None, **kwargs):
+        """
+        Open an existing vault, takes the same arguments as SecretsVault. Unlike
+        SecretsVault.open, a list of secrets files (a layered vault) is not supported.
+        Concurrent opens of the same vault with the same arguments share a single load.
+        """
+        arguments = inspect.signature(SecretsVault).bind(*args, **kwargs)
+        arguments.apply_defaults()
+        assert not isinstance(arguments.arguments["secrets_filepath"], (list, tuple)), (
+            "Layered vaults can't be opened asynchronously, open a single secrets file"
+        )
+        vault = await _load(arguments.arguments, executor)
+        return cls(vault, arguments.arguments, executor)
+
+    @classmethod
+    async def create(cls, *args, executor=None, **kwargs):
+        """
+        Create a new secrets file, returns the vault and the master key - keep it safe!
+        """
+        loop = asyncio.get_running_loop()
+        vault, master_key = await loop.run_in_executor(
+            executor, lambda: SecretsVault.create(*args, **kwargs)
+        )
+        arguments = {
+            "master_key": master_key,
+            "secrets_filepath": vault.secrets_filename,
+            "file_format": vault.file_format,
+        }
+        return cls(vault, arguments, executor), master_key
+
+    @property
+    def secrets(self):
+        return self.vault.secrets
+
+    async def get(self, key, default=None):
+        return self.vault.get(key, default)
+
+    async def require(self, key):
+        return self.vault.require(key)
+
+    def set(self, key, value):
+        self.vault.set(key, value)
+        return self
+
+    def delete(self, key):
+        self.vault.delete(key)
+        return self
+
+    async def load(self):
+        """
+        Reload the vault from disk. Until the new contents are ready, lookups keep
+        returning the previous ones.
+        """
+        self.vault = await _load(self._arguments, self.executor)
+
+    async def save(self):
+        """
+        Encrypt and write the secrets in the executor. Changes made while the save is in
+        flight copy the secrets first, and are written by the next save.
+        """
+        async with self._save_lock:
+            vault = self.vault
+            secrets = vault._secrets
+            shared = vault._shared
+            snapshot = vault._clone()
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.executor, snapshot.save)
+
+            if vault._secrets is secrets:
+                # nothing changed in the meantime, the vault matches the file again
+                vault._adopt(snapshot)
+                if vault._secrets is secrets:
+                    vault._shared = shared
+            # otherwise the next save merges the newer changes into the file
+
+
+async def _load(arguments, executor):
+    loop = asyncio.get_running_loop()
+    key = (
+        id(loop),
+        os.path.abspath(arguments["secrets_filepath"]),
+        *(
+            (name, value)
+            for name, value in sorted(arguments.items())
+            if name != "secrets_filepath"
+        ),
+    )
+    future = _inflight.get(key)
+    if future is None:
+        future = loop.run_in_executor(executor, lambda: SecretsVault(**arguments))
+        _inflight[key] = future
+        future.add_done_callback(lambda _: _inflight.pop(key, None))
+    # every caller gets its own vault, sharing the loaded secrets copy-on-write
+    vault = await asyncio.shield(future)
+    return vault._clone()
@@ -1,46 +1,639 @@
-import base64
+import binascii
+import json
 import logging
 import os
-import textwrap
-from cryptography.exceptions import InvalidTag
-from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+import struct
 
+from secrets_vault import instrumentation
 from secrets_vault.exceptions import (
     MasterKeyInvalid,
+    RotationFailed,
 )
 
 log = logging.getLogger(__name__)
 
+# Base64 encoded nonce + ciphertext of the whole vault, wrapped at 80 columns
+CONTAINER_TEXT = "text"
+# Versioned binary header + nonce + ciphertext of the whole vault, see encrypt_binary
+CONTAINER_BINARY = "binary"
+# Versioned binary stream of fixed-size authenticated segments, see encrypt_segmented
+CONTAINER_SEGMENTED = "segmented"
+# Every top-level entry encrypted on its own plus an encrypted manifest, see pack_entries
+CONTAINER_ENTRIES = "entries"
+# Encrypted snapshot followed by appended encrypted delta records, see pack_journal
+CONTAINER_JOURNAL = "journal"
+CONTAINERS = (
+    CONTAINER_TEXT,
+    CONTAINER_BINARY,
+    CONTAINER_SEGMENTED,
+    CONTAINER_ENTRIES,
+    CONTAINER_JOURNAL,
+)
+
+TEXT_LINE_WIDTH = 80
+# bytes encoded per line, 4 base64 characters for every 3 bytes
+TEXT_LINE_BYTES = TEXT_LINE_WIDTH // 4 * 3
+
+BINARY_MAGIC = b"\x00SVB"
+BINARY_VERSION = 1
+# magic, version
+BINARY_HEADER = struct.Struct(">4sB")
+NONCE_SIZE = 12
+
+SEGMENTED_MAGIC = b"\x00SVS"
+SEGMENTED_VERSION = 1
+# magic, version, segment size, HKDF salt, nonce prefix
+SEGMENTED_HEADER = struct.Struct(">4sBI16s7s")
+SEGMENTED_INFO = b"secrets-vault segmented v1"
+DEFAULT_SEGMENT_SIZE = 64 * 1024
+TAG_SIZE = 16
+MAX_SEGMENTS = 2**32
+
+ENTRIES_MAGIC = b"\x00SVE"
+ENTRIES_VERSION = 1
+# magic, version, random file id
+ENTRIES_HEADER = struct.Struct(">4sB16s")
+ENTRIES_MANIFEST_LENGTH = struct.Struct(">Q")
+
+JOURNAL_MAGIC = b"\x00SVJ"
+JOURNAL_VERSION = 1
+# magic, version, random file id
+JOURNAL_HEADER = struct.Struct(">4sB16s")
+JOURNAL_RECORD_LENGTH = struct.Struct(">I")
+
+INVALID_KEY_MESSAGE = (
+    "The master key is invalid. Make sure it is set and you are using the correct one."
+)
+
 
 class AES256GCMBackend:
-    def __init__(self, master_key=None):
+    def __init__(self, master_key, workers=None):
         self.master_key = master_key
+        # threads used to encrypt and decrypt segments concurrently, cryptography releases the GIL
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        # the key is parsed and checked up front (raising MasterKeyInvalid), the AEAD context
+        # is reused by every call
+        self._key, self._aead = self._load_key(master_key)
+
+    def encrypt(
+        self,
+        contents: bytes,
+        container=CONTAINER_TEXT,
+        segment_size=DEFAULT_SEGMENT_SIZE,
+    ) -> bytes:
+        if container == CONTAINER_SEGMENTED:
+            return self.encrypt_segmented(contents, segment_size)
+        if container == CONTAINER_BINARY:
+            return self.encrypt_binary(contents)
+        if container == CONTAINER_ENTRIES:
+            raise ValueError(
+                "The entries container is written per entry, use pack_entries instead"
+            )
+        if container == CONTAINER_JOURNAL:
+            raise ValueError(
+                "The journal container is written per record, use pack_journal instead"
+            )
+        if container != CONTAINER_TEXT:
+            raise ValueError(f"Unknown container {container}")
+
+        started = instrumentation.start()
+        nonce = os.urandom(NONCE_SIZE)
+        ciphertext = nonce + self._aead.encrypt(nonce, contents, b"")
+        instrumentation.emit("encrypt", started, len(contents))
+        started = instrumentation.start()
+        encoded = _wrap_base64(ciphertext)
+        instrumentation.emit("encode", started, len(ciphertext))
+        return encoded
+
+    def decrypt(self, contents: bytes) -> bytes:
+        container = self.detect_container(contents)
+        if container == CONTAINER_SEGMENTED:
+            return self.decrypt_segmented(contents)
+        if container == CONTAINER_BINARY:
+            return self.decrypt_binary(contents)
+        if container == CONTAINER_ENTRIES:
+            raise ValueError(
+                "The entries container is read per entry, use unpack_entries instead"
+            )
+        if container == CONTAINER_JOURNAL:
+            raise ValueError(
+                "The journal container is read per record, use unpack_journal instead"
+            )
+
+        from cryptography.exceptions import InvalidTag
 
-    def encrypt(self, contents: bytes) -> bytes:
         try:
-            nonce = os.urandom(12)
-            key = bytes.fromhex(self.master_key)
-            ciphertext = nonce + AESGCM(key).encrypt(nonce, contents, b"")
-            encoded = base64.b64encode(ciphertext)
-            return "\n".join(textwrap.wrap(encoded.decode("utf8"), width=80)).encode(
-                "utf8"
+            started = instrumentation.start()
+            # a2b_base64 skips the line breaks, no need to join the lines first
+            ciphertext = binascii.a2b_base64(contents)
+            instrumentation.emit("decode", started, len(contents))
+            started = instrumentation.start()
+            plaintext = self._aead.decrypt(
+                ciphertext[:NONCE_SIZE], ciphertext[NONCE_SIZE:], b""
             )
+            instrumentation.emit("decrypt", started, len(ciphertext))
+            return plaintext
         except (InvalidTag, ValueError, TypeError):
+            raise MasterKeyInvalid(INVALID_KEY_MESSAGE)
+
+    def encrypt_many(self, contents, container=CONTAINER_TEXT, workers=None) -> list:
+        """
+        Encrypt many blobs with the same key in one call, spread over worker threads.
+        """
+        return self._map(
+            lambda blob: self.encrypt(blob, container=container),
+            list(contents),
+            workers,
+        )
+
+    def decrypt_many(self, contents, workers=None) -> list:
+        """
+        Decrypt many blobs in one call, each in the container it was written with. Raises
+        MasterKeyInvalid if any of them fails to decrypt.
+        """
+        return self._map(self.decrypt, list(contents), workers)
+
+    def reencrypt(self, contents: bytes, backend) -> bytes:
+        """
+        Decrypt contents and encrypt them again with the key of another backend, in the same
+        container. The result is decrypted with the new key and compared with the original
+        plaintext before it is returned, raises RotationFailed if they differ.
+        """
+        container = self.detect_container(contents)
+        plaintext = self._open_all(contents)
+        if container == CONTAINER_ENTRIES:
+            header = backend.new_entries_header()
+            encrypted = backend.pack_entries(
+                header,
+                [
+                    (name, backend.seal_entry(header, name, data))
+                    for name, data in plaintext
+                ],
+            )
+        elif container == CONTAINER_JOURNAL:
+            encrypted = backend.pack_journal(plaintext)
+        elif container == CONTAINER_SEGMENTED:
+            _, _, segment_size = self._read_segmented_header(contents)
+            encrypted = backend.encrypt(plaintext, container, segment_size)
+        else:
+            encrypted = backend.encrypt(plaintext, container)
+
+        try:
+            verified = backend._open_all(encrypted) == plaintext
+        except MasterKeyInvalid:
+            verified = False
+        if not verified:
+            raise RotationFailed("The re-encrypted vault does not match the original")
+        return encrypted
+
+    def encrypt_binary(self, contents: bytes) -> bytes:
+        """
+        Encrypt contents as a single message stored as raw bytes, without the base64 overhead
+        of the text container. The header is authenticated with the ciphertext.
+        """
+        started = instrumentation.start()
+        header = BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION)
+        nonce = os.urandom(NONCE_SIZE)
+        encrypted = header + nonce + self._aead.encrypt(nonce, contents, header)
+        instrumentation.emit("encrypt", started, len(contents))
+        return encrypted
+
+    def decrypt_binary(self, contents: bytes) -> bytes:
+        from cryptography.exceptions import InvalidTag
+
+        view = memoryview(contents)
+        try:
+            magic, version = BINARY_HEADER.unpack_from(view)
+        except struct.error:
+            raise MasterKeyInvalid("The vault header is truncated.")
+        if magic != BINARY_MAGIC or version != BINARY_VERSION:
             raise MasterKeyInvalid(
-                "The master key is invalid. Make sure it is set and you are using the correct one."
+                f"Unsupported binary vault version {version}, upgrade secrets-vault."
             )
 
-    def decrypt(self, contents: bytes) -> bytes:
+        start = BINARY_HEADER.size
         try:
-            key = bytes.fromhex(self.master_key)
-            unwrapped = contents.replace(b"\n", b"")
-            ciphertext = base64.b64decode(unwrapped)
-            return AESGCM(key).decrypt(ciphertext[:12], ciphertext[12:], b"")
-        except (InvalidTag, ValueError, TypeError):
+            started = instrumentation.start()
+            # older cryptography releases (eg. 38.x) only accept bytes, not memoryviews
+            plaintext = self._aead.decrypt(
+                bytes(view[start : start + NONCE_SIZE]),
+                bytes(view[start + NONCE_SIZE :]),
+                bytes(view[:start]),
+            )
+            instrumentation.emit("decrypt", started, len(view))
+            return plaintext
+        except (InvalidTag, ValueError):
+            raise MasterKeyInvalid(INVALID_KEY_MESSAGE)
+
+    def encrypt_segmented(
+        self, contents: bytes, segment_size=DEFAULT_SEGMENT_SIZE
+    ) -> bytes:
+        """
+        Encrypt contents as a stream of independently authenticated segments.
+
+        Each file gets a random salt, from which a per-file key is derived with HKDF, and a
+        random nonce prefix. Segment nonces are the prefix, the segment index and a flag
+        marking the final segment, so segments cannot be reordered, dropped or truncated
+        without failing authentication. The header is authenticated with every segment.
+        """
+        started = instrumentation.start()
+        header, aead = self._new_segmented_header(segment_size)
+        view = memoryview(contents)
+        count = max(1, -(-len(view) // segment_size))
+        chunks = [view[i * segment_size : (i + 1) * segment_size] for i in range(count)]
+        encrypted = header + b"".join(
+            self._map(
+                lambda i: self._seal_segment(aead, header, i, count, chunks[i]),
+                range(count),
+            )
+        )
+        instrumentation.emit("encrypt", started, len(contents), segments=count)
+        return encrypted
+
+    def decrypt_segmented(self, contents: bytes) -> bytes:
+        started = instrumentation.start()
+        header, aead, segment_size = self._read_segmented_header(contents)
+        body = memoryview(contents)[SEGMENTED_HEADER.size :]
+        stride = segment_size + TAG_SIZE
+        count = max(1, -(-len(body) // stride))
+        segments = [body[i * stride : (i + 1) * stride] for i in range(count)]
+        plaintext = b"".join(
+            self._map(
+                lambda i: self._open_segment(aead, header, i, count, segments[i]),
+                range(count),
+            )
+        )
+        instrumentation.emit("decrypt", started, len(contents), segments=count)
+        return plaintext
+
+    def encrypt_stream(self, fin, fout, segment_size=DEFAULT_SEGMENT_SIZE):
+        """
+        Encrypt the readable binary stream fin into fout using the segmented container,
+        holding at most two segments in memory.
+        """
+        header, aead = self._new_segmented_header(segment_size)
+        fout.write(header)
+        index = 0
+        chunk = _read_exactly(fin, segment_size)
+        while True:
+            following = _read_exactly(fin, segment_size)
+            count = index + 1 if not following else index + 2
+            fout.write(self._seal_segment(aead, header, index, count, chunk))
+            if not following:
+                return
+            chunk = following
+            index += 1
+
+    def decrypt_stream(self, fin, fout):
+        """
+        Decrypt the readable binary stream fin into fout. Segmented vaults are decrypted one
+        segment at a time, other containers are read whole.
+        """
+        prefix = _read_exactly(fin, SEGMENTED_HEADER.size)
+        if self.detect_container(prefix) != CONTAINER_SEGMENTED:
+            fout.write(self.decrypt(prefix + fin.read()))
+            return
+
+        header, aead, segment_size = self._read_segmented_header(prefix)
+        stride = segment_size + TAG_SIZE
+        index = 0
+        segment = _read_exactly(fin, stride)
+        while True:
+            following = _read_exactly(fin, stride)
+            count = index + 1 if not following else index + 2
+            fout.write(self._open_segment(aead, header, index, count, segment))
+            if not following:
+                return
+            segment = following
+            index += 1
+
+    def new_entries_header(self) -> bytes:
+        return ENTRIES_HEADER.pack(ENTRIES_MAGIC, ENTRIES_VERSION, os.urandom(16))
+
+    def seal_entry(self, header: bytes, name: str, plaintext: bytes) -> bytes:
+        """
+        Encrypt a single entry. The entry is bound to its name and to the file header.
+        """
+        started = instrumentation.start()
+        nonce = os.urandom(NONCE_SIZE)
+        sealed = nonce + self._aead.encrypt(
+            nonce, plaintext, header + b"entry:" + name.encode()
+        )
+        instrumentation.emit("encrypt", started, len(plaintext), entry=name)
+        return sealed
+
+    def open_entry(self, header: bytes, name: str, blob, digest=None) -> bytes:
+        """
+        Decrypt a single entry, checking it against its digest in the manifest if given.
+        """
+        from cryptography.exceptions import InvalidTag
+
+        if digest is not None and _sha256(blob) != digest:
+            raise MasterKeyInvalid(
+                f"Entry {name} does not match the vault manifest, the file may be corrupted."
+            )
+        try:
+            started = instrumentation.start()
+            # blobs are memoryview slices, older cryptography releases only accept bytes
+            plaintext = self._aead.decrypt(
+                bytes(blob[:NONCE_SIZE]),
+                bytes(blob[NONCE_SIZE:]),
+                header + b"entry:" + name.encode(),
+            )
+            instrumentation.emit("decrypt", started, len(blob), entry=name)
+            return plaintext
+        except (InvalidTag, ValueError):
+            raise MasterKeyInvalid(INVALID_KEY_MESSAGE)
+
+    def pack_entries(self, header: bytes, entries) -> bytes:
+        """
+        Build an entries container from (name, sealed entry) pairs. The manifest of names,
+        offsets and entry digests is encrypted and authenticated with the header.
+        """
+        manifest = []
+        offset = 0
+        for name, blob in entries:
+            manifest.append([name, offset, len(blob), _sha256(blob)])
+            offset += len(blob)
+        nonce = os.urandom(NONCE_SIZE)
+        sealed = nonce + self._aead.encrypt(
+            nonce, json.dumps(manifest).encode(), header + b"manifest"
+        )
+        return b"".join(
+            [
+                header,
+                ENTRIES_MANIFEST_LENGTH.pack(len(sealed)),
+                sealed,
+                *(blob for _, blob in entries),
+            ]
+        )
+
+    def unpack_entries(self, contents: bytes):
+        """
+        Decrypt the manifest of an entries container. Returns the header and a list of
+        (name, sealed entry, digest) tuples, entries are left encrypted.
+        """
+        from cryptography.exceptions import InvalidTag
+
+        view = memoryview(contents)
+        try:
+            magic, version, _ = ENTRIES_HEADER.unpack_from(view)
+            (length,) = ENTRIES_MANIFEST_LENGTH.unpack_from(view, ENTRIES_HEADER.size)
+        except struct.error:
+            raise MasterKeyInvalid("The vault header is truncated.")
+        if magic != ENTRIES_MAGIC or version != ENTRIES_VERSION:
             raise MasterKeyInvalid(
-                "The master key is invalid. Make sure it is set and you are using the correct one."
+                f"Unsupported entries vault version {version}, upgrade secrets-vault."
             )
 
+        header = bytes(view[: ENTRIES_HEADER.size])
+        start = ENTRIES_HEADER.size + ENTRIES_MANIFEST_LENGTH.size
+        sealed = view[start : start + length]
+        try:
+            manifest = json.loads(
+                self._aead.decrypt(
+                    bytes(sealed[:NONCE_SIZE]),
+                    bytes(sealed[NONCE_SIZE:]),
+                    header + b"manifest",
+                )
+            )
+        except (InvalidTag, ValueError):
+            raise MasterKeyInvalid(INVALID_KEY_MESSAGE)
+
+        body = view[start + length :]
+        entries = []
+        for name, offset, size, digest in manifest:
+            if offset + size > len(body):
+                raise MasterKeyInvalid(f"Entry {name} is truncated.")
+            entries.append((name, body[offset : offset + size], digest))
+        return header, entries
+
+    def new_journal_header(self) -> bytes:
+        return JOURNAL_HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION, os.urandom(16))
+
+    def seal_journal_record(self, header: bytes, seq: int, plaintext: bytes) -> bytes:
+        """
+        Encrypt a journal record, prefixed with its length. Record 0 is the snapshot and the
+        following ones are deltas. Every record is bound to the file header and to its
+        position, so records can't be reordered, dropped from the middle of the journal or
+        moved to another file.
+        """
+        started = instrumentation.start()
+        nonce = os.urandom(NONCE_SIZE)
+        sealed = nonce + self._aead.encrypt(nonce, plaintext, _journal_aad(header, seq))
+        instrumentation.emit("encrypt", started, len(plaintext), record=seq)
+        return JOURNAL_RECORD_LENGTH.pack(len(sealed)) + sealed
+
+    def pack_journal(self, records, header=None) -> bytes:
+        """
+        Build a journal container from the plaintext records, the snapshot first.
+        """
+        header = header or self.new_journal_header()
+        return header + b"".join(
+            self.seal_journal_record(header, seq, record)
+            for seq, record in enumerate(records)
+        )
+
+    def unpack_journal(self, contents: bytes):
+        """
+        Decrypt every record of a journal container. Returns the header, the plaintext
+        records (the snapshot first) and the length of the valid contents. A truncated last
+        delta was being appended when its writer crashed, it is left out.
+        """
+        from cryptography.exceptions import InvalidTag
+
+        view = memoryview(contents)
+        try:
+            magic, version, _ = JOURNAL_HEADER.unpack_from(view)
+        except struct.error:
+            raise MasterKeyInvalid("The vault header is truncated.")
+        if magic != JOURNAL_MAGIC or version != JOURNAL_VERSION:
+            raise MasterKeyInvalid(
+                f"Unsupported journal vault version {version}, upgrade secrets-vault."
+            )
+
+        header = bytes(view[: JOURNAL_HEADER.size])
+        records = []
+        offset = JOURNAL_HEADER.size
+        while offset < len(view):
+            start = offset + JOURNAL_RECORD_LENGTH.size
+            if start > len(view) or (
+                start + JOURNAL_RECORD_LENGTH.unpack_from(view, offset)[0] > len(view)
+            ):
+                if not records:
+                    raise MasterKeyInvalid("The journal snapshot is truncated.")
+                # complete records are always authenticated, only a cut off tail is skipped
+                log.warning(
+                    f"Ignoring the incomplete last record {len(records)} of the journal"
+                )
+                break
+            (length,) = JOURNAL_RECORD_LENGTH.unpack_from(view, offset)
+            sealed = view[start : start + length]
+            try:
+                started = instrumentation.start()
+                # records are memoryview slices, older cryptography releases only accept bytes
+                records.append(
+                    self._aead.decrypt(
+                        bytes(sealed[:NONCE_SIZE]),
+                        bytes(sealed[NONCE_SIZE:]),
+                        _journal_aad(header, len(records)),
+                    )
+                )
+                instrumentation.emit("decrypt", started, length, record=len(records))
+            except (InvalidTag, ValueError):
+                if not records:
+                    raise MasterKeyInvalid(INVALID_KEY_MESSAGE)
+                raise MasterKeyInvalid(
+                    f"Journal record {len(records)} is corrupted or out of place."
+                )
+            offset = start + length
+        if not records:
+            raise MasterKeyInvalid("The journal has no snapshot.")
+        return header, records, offset
+
+    def _open_all(self, contents):
+        """
+        The plaintext of a vault in any container, a list of (name, plaintext) entries for
+        the entries container and a list of records for the journal container.
+        """
+        container = self.detect_container(contents)
+        if container == CONTAINER_JOURNAL:
+            return self.unpack_journal(contents)[1]
+        if container != CONTAINER_ENTRIES:
+            return self.decrypt(contents)
+        header, entries = self.unpack_entries(contents)
+        return [
+            (name, self.open_entry(header, name, blob, digest))
+            for name, blob, digest in entries
+        ]
+
+    @staticmethod
+    def detect_container(contents: bytes) -> str:
+        if contents[: len(SEGMENTED_MAGIC)] == SEGMENTED_MAGIC:
+            return CONTAINER_SEGMENTED
+        if contents[: len(ENTRIES_MAGIC)] == ENTRIES_MAGIC:
+            return CONTAINER_ENTRIES
+        if contents[: len(JOURNAL_MAGIC)] == JOURNAL_MAGIC:
+            return CONTAINER_JOURNAL
+        if contents[: len(BINARY_MAGIC)] == BINARY_MAGIC:
+            return CONTAINER_BINARY
+        return CONTAINER_TEXT
+
     @staticmethod
     def generate_master_key() -> str:
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
         return AESGCM.generate_key(bit_length=256).hex()
+
+    @staticmethod
+    def _load_key(master_key):
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+        try:
+            key = bytes.fromhex(master_key)
+            return key, AESGCM(key)
+        except (ValueError, TypeError):
+            raise MasterKeyInvalid(INVALID_KEY_MESSAGE)
+
+    def _new_segmented_header(self, segment_size):
+        if not 0 < segment_size < 2**32 - TAG_SIZE:
+            raise ValueError(f"Invalid segment size {segment_size}")
+        salt = os.urandom(16)
+        nonce_prefix = os.urandom(7)
+        header = SEGMENTED_HEADER.pack(
+            SEGMENTED_MAGIC, SEGMENTED_VERSION, segment_size, salt, nonce_prefix
+        )
+        return header, self._segment_aead(salt)
+
+    def _read_segmented_header(self, contents):
+        try:
+            magic, version, segment_size, salt, _ = SEGMENTED_HEADER.unpack_from(
+                contents
+            )
+        except struct.error:
+            raise MasterKeyInvalid("The segmented vault header is truncated.")
+        if magic != SEGMENTED_MAGIC or version != SEGMENTED_VERSION or not segment_size:
+            raise MasterKeyInvalid(
+                f"Unsupported segmented vault version {version}, upgrade secrets-vault."
+            )
+        header = bytes(contents[: SEGMENTED_HEADER.size])
+        return header, self._segment_aead(salt), segment_size
+
+    def _segment_aead(self, salt):
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+        key = HKDF(
+            algorithm=hashes.SHA256(), length=32, salt=salt, info=SEGMENTED_INFO
+        ).derive(self._key)
+        return AESGCM(key)
+
+    @staticmethod
+    def _segment_nonce(header, index, count):
+        if count > MAX_SEGMENTS:
+            raise ValueError("Too many segments, use a larger segment size")
+        nonce_prefix = header[-7:]
+        return nonce_prefix + struct.pack(">IB", index, index == count - 1)
+
+    def _seal_segment(self, aead, header, index, count, chunk):
+        # segments are memoryview slices, older cryptography releases only accept bytes
+        return aead.encrypt(
+            self._segment_nonce(header, index, count), bytes(chunk), header
+        )
+
+    def _open_segment(self, aead, header, index, count, segment):
+        from cryptography.exceptions import InvalidTag
+
+        try:
+            return aead.decrypt(
+                self._segment_nonce(header, index, count), bytes(segment), header
+            )
+        except (InvalidTag, ValueError):
+            raise MasterKeyInvalid(
+                f"Could not decrypt segment {index} of the vault. "
+                "Make sure you are using the correct master key and the file is not truncated or corrupted."
+            )
+
+    def _map(self, func, items, workers=None):
+        workers = workers or self.workers
+        if workers <= 1 or len(items) < 2:
+            return [func(item) for item in items]
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=min(workers, len(items))) as pool:
+            return list(pool.map(func, items))
+
+
+def _wrap_base64(data: bytes) -> bytes:
+    """
+    Base64 encode data in lines of TEXT_LINE_WIDTH characters, without a trailing newline.
+    """
+    view = memoryview(data)
+    # b2a_base64 terminates every line with a newline, drop the last one
+    return b"".join(
+        binascii.b2a_base64(view[i : i + TEXT_LINE_BYTES])
+        for i in range(0, len(view), TEXT_LINE_BYTES)
+    )[:-1]
+
+
+def _journal_aad(header: bytes, seq: int) -> bytes:
+    return header + b"journal:" + seq.to_bytes(8, "big")
+
+
+def _sha256(data) -> str:
+    import hashlib
+
+    return hashlib.sha256(data).hexdigest()
+
+
+def _read_exactly(fin, size) -> bytes:
+    # streams such as pipes may return fewer bytes than requested before EOF
+    data = fin.read(size)
+    while data and len(data) < size:
+        more = fin.read(size - len(data))
+        if not more:
+            break
+        data += more
+    return data
@@ -0,0 +1,66 @@
+import os
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_SIZE = 32
+
+
+class VaultCache:
+    """
+    Process-wide LRU cache of decrypted and parsed vaults.
+
+    Entries are keyed by the file identity (absolute path, mtime and size), a fingerprint
+    of the master key and the parse options, so a modified file or a different key never
+    hits a stale entry. Cached secrets are shared between vaults, which copy them before
+    changing them or handing them out.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(filepath, stat, master_key, *options):
+        import hashlib
+
+        fingerprint = hashlib.sha256(str(master_key).encode()).hexdigest()
+        return (
+            os.path.abspath(filepath),
+            stat.st_mtime_ns,
+            stat.st_size,
+            fingerprint,
+            *options,
+        )
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, filepath=None):
+        """
+        Drop every entry for the given file, or the whole cache if no file is given.
+        """
+        with self._lock:
+            if filepath is None:
+                self._entries.clear()
+                return
+            path = os.path.abspath(filepath)
+            for key in [k for k in self._entries if k[0] == path]:
+                del self._entries[key]
+
+
+vault_cache = VaultCache()
@@ -0,0 +1,103 @@
+import hashlib
+import json
+
+# compared directly, without computing digests
+PLAIN_TYPES = (str, int, bool)
+
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+
+
+class TreeDigest:
+    """
+    Merkle digests of a secrets tree: the digest of a dict covers its keys and the digests
+    of its values, regardless of key order. Digests are computed once per node, on demand.
+    """
+
+    def __init__(self):
+        # id(node) -> (node, digest), the node is kept so its id is not reused
+        self._digests = {}
+
+    def digest(self, value):
+        if not isinstance(value, dict):
+            return _leaf_bytes(value)
+        cached = self._digests.get(id(value))
+        if cached is not None:
+            return cached[1]
+        parts = [b"dict"]
+        for key in sorted(value, key=str):
+            for part in (_leaf_bytes(key), self.digest(value[key])):
+                parts.append(len(part).to_bytes(4, "big"))
+                parts.append(part)
+        digest = hashlib.blake2b(b"".join(parts), digest_size=16).digest()
+        self._digests[id(value)] = (value, digest)
+        return digest
+
+
+def diff(old, new):
+    """
+    Yield the changes from the secrets tree old to new as (change, path, old value,
+    new value) tuples, where change is "added", "removed" or "changed" and path is the
+    dotted key path. Subtrees with the same digest are skipped without visiting their keys.
+    """
+    digests = TreeDigest()
+    if isinstance(old, dict) and isinstance(new, dict):
+        yield from _diff_dicts(digests, old, new, "")
+    elif not _same(digests, old, new):
+        yield CHANGED, "", old, new
+
+
+def _diff_dicts(digests, old, new, prefix):
+    for key, value in old.items():
+        path = f"{prefix}{key}"
+        if key not in new:
+            yield REMOVED, path, value, None
+            continue
+        other = new[key]
+        if _same(digests, value, other):
+            continue
+        if isinstance(value, dict) and isinstance(other, dict):
+            yield from _diff_dicts(digests, value, other, f"{path}.")
+        else:
+            yield CHANGED, path, value, other
+    for key, value in new.items():
+        if key not in old:
+            yield ADDED, f"{prefix}{key}", None, value
+
+
+def _same(digests, a, b):
+    if a is b:
+        return True
+    if type(a) is type(b) and type(a) in PLAIN_TYPES:
+        return a == b
+    return digests.digest(a) == digests.digest(b)
+
+
+def _leaf_bytes(value):
+    """
+    Encoding of a value that is not a dict, so values compare equal if and only if their
+    encodings do. The type is part of it, so 1, "1" and True differ, while the round-trip
+    YAML types (eg. CommentedSeq, ScalarFloat) match the plain ones.
+    """
+    if isinstance(value, str):
+        return b"s" + value.encode("utf8", "surrogatepass")
+    return json.dumps(_tagged(value), sort_keys=True).encode()
+
+
+def _tagged(value):
+    if isinstance(value, str):
+        return ["s", str(value)]
+    if isinstance(value, bool):
+        return ["b", bool(value)]
+    if isinstance(value, int):
+        return ["i", int(value)]
+    if isinstance(value, float):
+        return ["f", float(value)]
+    if isinstance(value, dict):
+        return ["d", {str(k): _tagged(v) for k, v in value.items()}]
+    if isinstance(value, (list, tuple)):
+        return ["l", [_tagged(v) for v in value]]
+    if value is None:
+        return None
+    return ["?", str(value)]
@@ -0,0 +1,141 @@
+from secrets_vault import exceptions
+
+
+class EntryStore:
+    """
+    Vault state for the entries container, where every top-level entry is encrypted on its
+    own. Entries are only decrypted into the secrets tree when they are first accessed, and
+    entries that did not change are written back without encrypting them again.
+    """
+
+    def __init__(self, vault, header, entries=()):
+        self.vault = vault
+        self.header = header
+        self.order = [name for name, _, _ in entries]
+        self.blobs = {name: (blob, digest) for name, blob, digest in entries}
+        # names of entries that have not been decrypted yet, in file order
+        self.pending = dict.fromkeys(self.order)
+        # plaintext digest of every decrypted entry, to detect unchanged entries on save
+        self.digests = {}
+
+    @classmethod
+    def unpack(cls, vault, contents):
+        header, entries = vault.backend.unpack_entries(contents)
+        return cls(vault, header, entries)
+
+    @classmethod
+    def new(cls, vault):
+        return cls(vault, vault.backend.new_entries_header())
+
+    def load_for(self, secrets, key):
+        """
+        Decrypt the entries a lookup of key may touch: every pending top-level entry whose
+        name is a dotted prefix of key, or all of them for keys using pydash path syntax.
+        """
+        if not self.pending:
+            return
+        if not isinstance(key, str) or any(c in key for c in "[]\\"):
+            self.load_all(secrets)
+            return
+
+        parts = key.split(".")
+        for i in range(1, len(parts) + 1):
+            name = ".".join(parts[:i])
+            if name in self.pending:
+                self.load(secrets, name)
+
+    def load_all(self, secrets):
+        if not self.pending:
+            return
+        for name in list(self.pending):
+            self.load(secrets, name)
+        # entries are decrypted in access order, restore the order of the file
+        for name in self.order:
+            key = self._key_of(secrets, name)
+            if key is not None:
+                secrets[key] = secrets.pop(key)
+
+    def load(self, secrets, name):
+        from secrets_vault.vault import _digest
+
+        blob, digest = self.blobs[name]
+        plaintext = self.vault.backend.open_entry(self.header, name, blob, digest)
+        try:
+            fragment = self.vault._deserialize(plaintext)
+            ((key, value),) = fragment.items()
+        except Exception as e:
+            raise exceptions.MalformedSecretsFile(
+                f"Could not parse secrets entry {name}: {e}"
+            )
+
+        secrets[key] = value
+        if hasattr(fragment, "ca") and hasattr(secrets, "ca"):
+            # keep round-trip comments, the document comment travels with the first entry
+            if key in fragment.ca.items:
+                secrets.ca.items[key] = fragment.ca.items[key]
+            if fragment.ca.comment:
+                secrets.ca.comment = fragment.ca.comment
+        self.digests[name] = _digest(plaintext)
+        del self.pending[name]
+        self.vault._refresh_index(key)
+
+    def pack(self, secrets):
+        """
+        Return whether anything changed since the file was read, and the (name, sealed entry)
+        pairs to write. Pending and unchanged entries reuse their existing ciphertext.
+        """
+        from secrets_vault.vault import _digest
+
+        keys = {str(key): key for key in secrets}
+        names = [name for name in self.order if name in keys or name in self.pending]
+        names += [name for name in keys if name not in self.blobs]
+
+        changed = names != self.order
+        entries = []
+        for position, name in enumerate(names):
+            if name in self.pending:
+                entries.append((name, self.blobs[name][0]))
+                continue
+
+            plaintext = self.vault._serialize(
+                self._fragment(secrets, keys[name], first=position == 0)
+            )
+            digest = _digest(plaintext)
+            if name in self.blobs and self.digests.get(name) == digest:
+                entries.append((name, self.blobs[name][0]))
+                continue
+
+            blob = self.vault.backend.seal_entry(self.header, name, plaintext)
+            entries.append((name, blob))
+            self.digests[name] = digest
+            changed = True
+        return changed, entries
+
+    def commit(self, entries):
+        """
+        Record the entries that were written, so the next save can reuse them.
+        """
+        self.order = [name for name, _ in entries]
+        self.blobs = {name: (blob, None) for name, blob in entries}
+
+    @staticmethod
+    def _fragment(secrets, key, first):
+        if not hasattr(secrets, "ca"):
+            return {key: secrets[key]}
+
+        fragment = type(secrets)()
+        fragment[key] = secrets[key]
+        if key in secrets.ca.items:
+            fragment.ca.items[key] = secrets.ca.items[key]
+        if first and secrets.ca.comment:
+            fragment.ca.comment = secrets.ca.comment
+        return fragment
+
+    @staticmethod
+    def _key_of(secrets, name):
+        if name in secrets:
+            return name
+        for key in secrets:
+            if str(key) == name:
+                return key
+        return None
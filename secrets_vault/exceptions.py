@@ -20,3 +20,21 @@ class SecretsFileAlreadyExists(SecretsStoreException):
 
 class MalformedSecretsFile(SecretsStoreException):
     pass
+
+
+class ReadOnlyVault(SecretsStoreException):
+    pass
+
+
+class AgentUnavailable(SecretsStoreException):
+    pass
+
+
+class SecretsConflict(SecretsStoreException):
+    def __init__(self, message, keys=()):
+        super().__init__(message)
+        self.keys = list(keys)
+
+
+class RotationFailed(SecretsStoreException):
+    pass
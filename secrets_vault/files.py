@@ -0,0 +1,120 @@
+import contextlib
+import os
+import stat
+import threading
+
+
+@contextlib.contextmanager
+def atomic_write(filepath, mode="wb"):
+    """
+    Write to a temporary file next to filepath and atomically rename it over filepath once
+    the block succeeds, so readers never see a partially written file. A symlink at filepath
+    is followed, its target is replaced and the link kept.
+    """
+    import tempfile
+
+    filepath = os.path.realpath(filepath)
+    directory = os.path.dirname(filepath)
+    filedesc, tmpname = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(filepath)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(filedesc, mode) as fout:
+            yield fout
+            fout.flush()
+            os.fsync(fout.fileno())
+        if os.path.exists(filepath):
+            os.chmod(tmpname, stat.S_IMODE(os.stat(filepath).st_mode))
+        os.replace(tmpname, filepath)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmpname)
+        raise
+    fsync_dir(directory)
+
+
+def file_identity(filepath):
+    """
+    Inode, modification time and size of filepath, or None if it does not exist. Changes
+    whenever the file is written or replaced.
+    """
+    try:
+        return stat_identity(os.stat(filepath))
+    except FileNotFoundError:
+        return None
+
+
+def stat_identity(st):
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def fsync_dir(directory):
+    # persist the rename itself, not supported on every platform
+    try:
+        dirdesc = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dirdesc)
+    except OSError:
+        pass
+    finally:
+        os.close(dirdesc)
+
+
+class _FileLock:
+    """
+    Advisory lock on a sidecar file, exclusive across processes and reentrant within a thread.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.depth = 0
+        self.fd = None
+        self._thread_lock = threading.RLock()
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self.depth == 0:
+            try:
+                self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+                try:
+                    import fcntl
+                except ImportError:
+                    # no advisory locks on this platform, only threads are serialized
+                    pass
+                else:
+                    fcntl.flock(self.fd, fcntl.LOCK_EX)
+            except BaseException:
+                if self.fd is not None:
+                    os.close(self.fd)
+                    self.fd = None
+                self._thread_lock.release()
+                raise
+        self.depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self.depth -= 1
+        if self.depth == 0:
+            # closing the file releases the lock
+            os.close(self.fd)
+            self.fd = None
+        self._thread_lock.release()
+
+
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+
+
+def file_lock(filepath):
+    """
+    Exclusive advisory lock for filepath, held on a `<filepath>.lock` file next to it since
+    atomic writes replace filepath itself. Blocks until the lock is available.
+    """
+    path = os.path.abspath(filepath) + ".lock"
+    with _file_locks_guard:
+        lock = _file_locks.get(path)
+        if lock is None:
+            lock = _file_locks[path] = _FileLock(path)
+    return lock
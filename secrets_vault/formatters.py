@@ -1,7 +1,32 @@
-__all__ = ["yaml"]
+__all__ = ["yaml", "safe_yaml"]
 
-from ruamel.yaml import YAML
 
-# Configure roundtrip YAML formatter
-yaml = YAML(typ="rt")
-yaml.width = 4096
+def _make_yaml():
+    from ruamel.yaml import YAML
+
+    # Configure roundtrip YAML formatter
+    yaml = YAML(typ="rt")
+    yaml.width = 4096
+    # frozen vaults hold FrozenDicts, dumped as plain mappings
+    from secrets_vault.frozen import FrozenDict
+
+    yaml.representer.add_representer(FrozenDict, type(yaml.representer).represent_dict)
+    return yaml
+
+
+def _make_safe_yaml():
+    from ruamel.yaml import YAML
+
+    # Read-only YAML loader, uses the C extension when available and produces plain dicts
+    return YAML(typ="safe")
+
+
+_factories = {"yaml": _make_yaml, "safe_yaml": _make_safe_yaml}
+
+
+def __getattr__(name):
+    # ruamel.yaml is only imported once a YAML formatter is actually used
+    if name in _factories:
+        globals()[name] = _factories[name]()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
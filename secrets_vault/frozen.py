@@ -0,0 +1,45 @@
+import sys
+
+
+class FrozenDict(dict):
+    """
+    Immutable dict used by frozen vaults. It is still a dict, so lookups, the key index,
+    pydash and json work unchanged, while changing it raises TypeError.
+    """
+
+    __slots__ = ()
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("Frozen secrets cannot be changed")
+
+    __setitem__ = __delitem__ = __ior__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+def freeze(value, strings=None):
+    """
+    Convert a secrets tree into a compact immutable one: dicts become FrozenDicts sized for
+    their keys, lists become tuples, keys are interned and equal string values are shared.
+    """
+    if strings is None:
+        strings = {}
+    if isinstance(value, dict):
+        return FrozenDict({_intern(k): freeze(v, strings) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v, strings) for v in value)
+    if type(value) is str:
+        return strings.setdefault(value, value)
+    return value
+
+
+def _intern(key):
+    return sys.intern(key) if type(key) is str else key
@@ -0,0 +1,124 @@
+from secrets_vault import constants
+
+# characters with a special meaning in pydash paths, keys containing them are not indexed
+PATH_SYNTAX = ".[]\\"
+
+
+class KeyIndex:
+    """
+    Flattened index of dotted key paths (eg. "dev.admins.2") to the values of a secrets tree.
+
+    Paths resolve exactly like pydash.get for keys without escapes or brackets, so lookups
+    are a single dict access instead of parsing and walking the path on every call.
+    """
+
+    def __init__(self, secrets):
+        self._paths = {}
+        if isinstance(secrets, (dict, list, tuple)):
+            for segment, child in _children(secrets):
+                self._add(segment, child)
+
+    def __len__(self):
+        return len(self._paths)
+
+    def get(self, path, default=None):
+        return self._paths.get(path, default)
+
+    def paths(self):
+        return self._paths.keys()
+
+    def refresh(self, secrets, path):
+        """
+        Bring the index up to date after the value at path was set or deleted in secrets.
+        Only the subtree below the first changed node along the path is re-indexed.
+        """
+        if not isinstance(secrets, dict):
+            self.__init__(secrets)
+            return
+
+        node = secrets
+        prefix = None
+        parts = path.split(".")
+        for i, part in enumerate(parts):
+            if isinstance(node, list):
+                # list mutations shift the following items, so re-index the whole list
+                self._remove(prefix)
+                self._add(prefix, node)
+                return
+
+            current = part if prefix is None else f"{prefix}.{part}"
+            child = _child(node, part)
+            if child is constants.UNSET:
+                self._remove(current)
+                return
+            if (
+                i == len(parts) - 1
+                or self._paths.get(current, constants.UNSET) is not child
+            ):
+                self._remove(current)
+                self._add(current, child)
+                return
+
+            node = child
+            prefix = current
+
+    def _add(self, path, value):
+        self._paths[path] = value
+        for segment, child in _children(value):
+            self._add(f"{path}.{segment}", child)
+
+    def _remove(self, path):
+        value = self._paths.pop(path, constants.UNSET)
+        if isinstance(value, list):
+            # the list may have been mutated in place, follow what was indexed instead
+            i = 0
+            while f"{path}.{i}" in self._paths:
+                self._remove(f"{path}.{i}")
+                i += 1
+        elif isinstance(value, dict):
+            for segment, _ in _children(value):
+                self._remove(f"{path}.{segment}")
+
+
+def walk(secrets, path):
+    """
+    Resolve a dotted path by walking the tree, as KeyIndex.get would without building the
+    index. Returns UNSET when the path does not resolve.
+    """
+    node = secrets
+    for segment in path.split("."):
+        node = _child(node, segment)
+        if node is constants.UNSET:
+            break
+    return node
+
+
+def _children(value):
+    if isinstance(value, dict):
+        for k, v in value.items():
+            if isinstance(k, str):
+                if not any(c in k for c in PATH_SYNTAX):
+                    yield k, v
+            elif type(k) is int and str(k) not in value:
+                # pydash falls back to integer keys when the string key is missing
+                yield str(k), v
+    elif isinstance(value, (list, tuple)):
+        for i, v in enumerate(value):
+            yield str(i), v
+
+
+def _child(node, segment):
+    if isinstance(node, dict):
+        value = node.get(segment, constants.UNSET)
+        if value is constants.UNSET:
+            try:
+                value = node.get(int(segment), constants.UNSET)
+            except ValueError:
+                pass
+        return value
+    if isinstance(node, (list, tuple)):
+        try:
+            return node[int(segment)] if int(segment) >= 0 else constants.UNSET
+        except (ValueError, IndexError):
+            return constants.UNSET
+    return constants.UNSET
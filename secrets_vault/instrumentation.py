@@ -0,0 +1,130 @@
+"""
+Timing and size events for the phases of loading, reading and saving a vault: file read
+and write, base64 decode and encode, AES-GCM, parsing, lookups and serialization.
+
+Events are passed to the hooks installed with add_hook, any callable taking a PhaseEvent,
+eg. a metrics sink. Without hooks nothing is timed and no events are built.
+
+    from secrets_vault import instrumentation
+
+    instrumentation.add_hook(lambda event: statsd.timing(event.phase, event.seconds))
+"""
+
+import threading
+import time
+
+# installed hooks, the phases are only timed while this is not empty
+hooks = []
+
+
+class PhaseEvent:
+    __slots__ = ("phase", "seconds", "nbytes", "fields")
+
+    def __init__(self, phase, seconds, nbytes=None, fields=None):
+        self.phase = phase
+        self.seconds = seconds
+        self.nbytes = nbytes
+        self.fields = fields or {}
+
+    def __repr__(self):
+        return (
+            f"PhaseEvent({self.phase!r}, seconds={self.seconds:.6f}, "
+            f"nbytes={self.nbytes!r}, fields={self.fields!r})"
+        )
+
+    def as_dict(self):
+        return {
+            "phase": self.phase,
+            "seconds": self.seconds,
+            "nbytes": self.nbytes,
+            **self.fields,
+        }
+
+
+def add_hook(hook):
+    hooks.append(hook)
+    return hook
+
+
+def remove_hook(hook):
+    if hook in hooks:
+        hooks.remove(hook)
+
+
+def start():
+    """
+    Start timing a phase. Returns None when no hook is installed, which emit() ignores.
+    """
+    return time.perf_counter() if hooks else None
+
+
+def emit(phase, started, nbytes=None, **fields):
+    """
+    Send the event of a phase started with start() to every hook.
+    """
+    if started is None:
+        return
+    event = PhaseEvent(phase, time.perf_counter() - started, nbytes, fields)
+    for hook in list(hooks):
+        hook(event)
+
+
+class Profile:
+    """
+    Hook adding up the calls, time and bytes of every phase, used by `secrets --profile`.
+
+        with Profile() as profile:
+            vault = SecretsVault.open(secrets_filepath="./secrets.yml.enc")
+        print(profile.report())
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            calls, seconds, nbytes = self.phases.get(event.phase, (0, 0.0, 0))
+            self.phases[event.phase] = (
+                calls + 1,
+                seconds + event.seconds,
+                nbytes + (event.nbytes or 0),
+            )
+
+    def __enter__(self):
+        return add_hook(self)
+
+    def __exit__(self, *exc):
+        remove_hook(self)
+
+    def report(self):
+        rows = [("phase", "calls", "time", "bytes")]
+        for phase, (calls, seconds, nbytes) in self.phases.items():
+            rows.append(
+                (phase, str(calls), _format_seconds(seconds), _format_bytes(nbytes))
+            )
+        total = time.perf_counter() - self.started
+        rows.append(("total", "", _format_seconds(total), ""))
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        return "\n".join(
+            "  ".join(
+                cell.ljust(width) if i == 0 else cell.rjust(width)
+                for i, (cell, width) in enumerate(zip(row, widths))
+            ).rstrip()
+            for row in rows
+        )
+
+
+def _format_seconds(seconds):
+    return f"{seconds * 1000:.2f} ms"
+
+
+def _format_bytes(nbytes):
+    if not nbytes:
+        return "-"
+    for unit in ("B", "KB", "MB"):
+        if nbytes < 1024:
+            return f"{nbytes:.0f} {unit}" if unit == "B" else f"{nbytes:.1f} {unit}"
+        nbytes /= 1024
+    return f"{nbytes:.1f} GB"
@@ -0,0 +1,99 @@
+from secrets_vault import constants, exceptions
+
+# compact once the journal holds this many deltas
+MAX_DELTAS = 1000
+# or once its deltas are larger than the snapshot, and larger than this
+MIN_COMPACT_SIZE = 64 * 1024
+
+
+class Journal:
+    """
+    Vault state for the journal container, where save() appends a small encrypted delta of
+    the changed keys instead of rewriting the vault. Loading replays the deltas on top of
+    the snapshot, compaction folds them into a new snapshot.
+    """
+
+    def __init__(self, header, length, deltas=0, snapshot_size=0, deltas_size=0):
+        self.header = header
+        # length of the valid contents of the file, the next record is written there
+        self.length = length
+        self.deltas = deltas
+        # plaintext sizes, to decide when to compact
+        self.snapshot_size = snapshot_size
+        self.deltas_size = deltas_size
+
+    @classmethod
+    def unpack(cls, vault, contents):
+        """
+        Load a journal container. Returns the journal and the secrets of its snapshot with
+        every delta replayed on top.
+        """
+        header, records, length = vault.backend.unpack_journal(contents)
+        snapshot, *deltas = records
+        try:
+            secrets = vault._deserialize(snapshot)
+            for delta in deltas:
+                replay(secrets, vault._deserialize(delta))
+        except Exception as e:
+            raise exceptions.MalformedSecretsFile(
+                f"Could not parse secrets journal: {e}"
+            )
+        journal = cls(
+            header,
+            length,
+            len(deltas),
+            len(snapshot),
+            sum(len(delta) for delta in deltas),
+        )
+        return journal, secrets
+
+    def should_compact(self, delta_size):
+        deltas_size = self.deltas_size + delta_size
+        return self.deltas >= MAX_DELTAS or (
+            deltas_size > self.snapshot_size and deltas_size > MIN_COMPACT_SIZE
+        )
+
+    def appended(self, delta_size, record_size):
+        return Journal(
+            self.header,
+            self.length + record_size,
+            self.deltas + 1,
+            self.snapshot_size,
+            self.deltas_size + delta_size,
+        )
+
+
+def operations(vault, keys):
+    """
+    The delta for the changed keys: the current value of every key, or its deletion.
+    Keys below another changed key are left out, the value of the ancestor already holds
+    them. The paths left never contain one another, and the vault only records keys whose
+    set or delete succeeded, so replaying the final values in any order gives the current
+    secrets. Changes below a list item are recorded at the whole list by the vault.
+    """
+    from secrets_vault.vault import _covered
+
+    delta = []
+    for key in keys:
+        if _covered(key, keys):
+            continue
+        value = vault._get(key, constants.UNSET)
+        if value is not constants.UNSET:
+            delta.append({"set": key, "value": value})
+            continue
+        delta.append({"delete": key})
+        parent = key.rpartition(".")[0]
+        if parent and vault._get(parent, constants.UNSET) == {}:
+            # the delete emptied a dict that may have been created since the last save
+            delta.append({"set": parent, "value": {}})
+    return delta
+
+
+def replay(secrets, delta):
+    from secrets_vault.vault import _delete_path, _set_path
+
+    for operation in delta:
+        if "delete" in operation:
+            _delete_path(secrets, operation["delete"])
+        else:
+            _set_path(secrets, operation["set"], operation["value"])
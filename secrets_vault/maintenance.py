@@ -0,0 +1,232 @@
+import logging
+import os
+import time
+from pathlib import Path
+
+from secrets_vault import constants, exceptions
+from secrets_vault.cache import vault_cache
+from secrets_vault.files import atomic_write, file_lock
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PATTERN = "*.enc"
+
+
+class RotationReport:
+    """
+    Outcome of rotate_master_key: the vaults rotated, already rotated and failed, and the
+    throughput of the rotation.
+    """
+
+    def __init__(self):
+        self.rotated = []
+        self.skipped = []
+        # (filepath, exception) pairs
+        self.failed = []
+        self.nbytes = 0
+        self.seconds = 0.0
+
+    @property
+    def throughput(self):
+        """
+        Bytes rotated per second.
+        """
+        return self.nbytes / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        return (
+            f"Rotated {len(self.rotated)} vaults ({self.nbytes / 1024:.1f} KB) "
+            f"in {self.seconds:.2f}s, {self.throughput / 1024 / 1024:.1f} MB/s, "
+            f"{len(self.skipped)} already rotated, {len(self.failed)} failed"
+        )
+
+
+def find_vaults(paths, pattern=DEFAULT_PATTERN):
+    """
+    Yield the given vault files, and the files matching pattern under the given directories.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            yield from sorted(str(p) for p in Path(path).rglob(pattern) if p.is_file())
+        else:
+            yield str(path)
+
+
+def rotate_master_key(
+    paths,
+    old_master_key,
+    new_master_key,
+    workers=None,
+    pattern=DEFAULT_PATTERN,
+    backend=constants.DEFAULT_BACKEND,
+):
+    """
+    Re-encrypt vault files, or the vaults under directories, from the old master key to the
+    new one. Files are rotated concurrently, each one is verified to decrypt to the same
+    plaintext with the new key before it atomically replaces the old file. Vaults that
+    already decrypt with the new key are skipped, so a failed rotation can be run again.
+
+        report = rotate_master_key(["./vaults"], old_key, new_key)
+        print(report.summary())
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    old = backend(old_master_key)
+    new = backend(new_master_key)
+    filepaths = list(find_vaults(paths, pattern))
+    report = RotationReport()
+
+    start = time.perf_counter()
+    # AES-GCM releases the GIL, threads rotate files in parallel
+    with ThreadPoolExecutor(
+        max_workers=workers or min(32, os.cpu_count() or 1)
+    ) as pool:
+        results = pool.map(lambda filepath: _rotate(filepath, old, new), filepaths)
+        for filepath, (status, result) in zip(filepaths, results):
+            if status == "rotated":
+                report.rotated.append(filepath)
+                report.nbytes += result
+            elif status == "skipped":
+                report.skipped.append(filepath)
+            else:
+                log.error(f"Could not rotate {filepath}: {result}")
+                report.failed.append((filepath, result))
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def _rotate(filepath, old, new):
+    try:
+        with file_lock(filepath):
+            with open(filepath, "rb") as fin:
+                contents = fin.read()
+            if not contents:
+                return "skipped", None
+            try:
+                rotated = old.reencrypt(contents, new)
+            except exceptions.MasterKeyInvalid:
+                if _opens(new, contents):
+                    return "skipped", None
+                raise
+            with atomic_write(filepath) as fout:
+                fout.write(rotated)
+        vault_cache.invalidate(filepath)
+        log.info(f"Rotated {filepath}")
+        return "rotated", len(contents)
+    except (exceptions.SecretsStoreException, OSError) as e:
+        return "failed", e
+
+
+def _opens(backend, contents):
+    try:
+        backend._open_all(contents)
+        return True
+    except exceptions.MasterKeyInvalid:
+        return False
+
+
+class CheckReport:
+    """
+    Outcome of check_vaults, one result dict per vault file with its path, whether it
+    decrypted and parsed ("ok"), the error, container, size, number of keys and timing.
+    """
+
+    def __init__(self, results, seconds):
+        self.results = results
+        self.seconds = seconds
+
+    @property
+    def failed(self):
+        return [result for result in self.results if not result["ok"]]
+
+    def as_dict(self):
+        return {
+            "ok": not self.failed,
+            "vaults": len(self.results),
+            "failed": len(self.failed),
+            "seconds": self.seconds,
+            "results": self.results,
+        }
+
+    def summary(self):
+        return (
+            f"Checked {len(self.results)} vaults in {self.seconds:.2f}s, "
+            f"{len(self.failed)} failed"
+        )
+
+
+def check_vaults(
+    paths,
+    master_key,
+    workers=None,
+    pattern=DEFAULT_PATTERN,
+    file_format=None,
+    processes=True,
+):
+    """
+    Check that every vault file, or every vault under directories, decrypts and parses.
+    master_key is the key of all vaults, or a function returning the key of a vault path.
+    The format of a vault is taken from its name (.json.enc or .yml.enc) unless file_format
+    is given.
+
+    Vaults are checked concurrently in worker processes, since parsing holds the GIL, or in
+    threads with processes=False. Never raises for a broken vault, see CheckReport.failed.
+
+        report = check_vaults(["./services"], master_key)
+        assert not report.failed, report.failed
+    """
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    jobs = []
+    for filepath in find_vaults(paths, pattern):
+        key = master_key(filepath) if callable(master_key) else master_key
+        jobs.append((filepath, key, file_format or _guess_format(filepath)))
+
+    start = time.perf_counter()
+    if len(jobs) < 2 or workers == 1:
+        results = [_check(*job) for job in jobs]
+    else:
+        pool_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        with pool_class(max_workers=workers or os.cpu_count() or 1) as pool:
+            chunksize = max(1, len(jobs) // ((workers or os.cpu_count() or 1) * 4))
+            results = list(pool.map(_check, *zip(*jobs), chunksize=chunksize))
+    return CheckReport(results, time.perf_counter() - start)
+
+
+def _check(filepath, master_key, file_format):
+    from secrets_vault.vault import SecretsVault
+
+    result = {"path": filepath, "ok": False, "error": None, "error_type": None}
+    start = time.perf_counter()
+    try:
+        result["size"] = os.path.getsize(filepath)
+        if master_key is None:
+            raise exceptions.MasterKeyNotFound(f"No master key found for {filepath}")
+        vault = SecretsVault(
+            master_key=master_key,
+            secrets_filepath=filepath,
+            file_format=file_format,
+            read_only=True,
+        )
+        result["container"] = vault._file_container
+        result["keys"] = _count_keys(vault.secrets)
+        result["ok"] = True
+    except (exceptions.SecretsStoreException, OSError) as e:
+        result["error"] = str(e)
+        result["error_type"] = type(e).__name__
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def _guess_format(filepath):
+    suffixes = Path(filepath).suffixes
+    return "json" if ".json" in suffixes else "yaml"
+
+
+def _count_keys(value):
+    """
+    Number of leaf values in a secrets tree.
+    """
+    if isinstance(value, dict):
+        return sum(_count_keys(child) for child in value.values())
+    return 1
@@ -0,0 +1,158 @@
+import threading
+
+from secrets_vault import constants, exceptions
+
+
+class LayeredSecretsVault:
+    """
+    Read-only view over an ordered list of vaults, eg. base, environment and region
+    vaults. Later layers override earlier ones, and dicts are merged key by key.
+
+    Layers are only decrypted once they are consulted: get() walks the layers from the
+    highest one down and stops at the first non-dict value, while reading the whole merged
+    view decrypts all remaining layers concurrently.
+
+        vault = SecretsVault.open(secrets_filepath=["base.yml.enc", "prod.yml.enc"])
+        vault.get("database-url")
+    """
+
+    def __init__(self, secrets_filepaths, workers=None, **kwargs):
+        from secrets_vault.vault import SecretsVault
+
+        if not secrets_filepaths:
+            raise ValueError("At least one secrets file is required")
+        self.secrets_filenames = list(secrets_filepaths)
+        self.workers = workers
+        self.read_only = True
+        kwargs["read_only"] = True
+        self._open = lambda filepath: SecretsVault(secrets_filepath=filepath, **kwargs)
+        self._layers = [None] * len(self.secrets_filenames)
+        self._locks = [threading.Lock() for _ in self.secrets_filenames]
+        self._merged = None
+
+    @property
+    def layers(self):
+        """
+        The vault of every layer, lowest first. Decrypts the layers not loaded yet.
+        """
+        self._load_all()
+        return list(self._layers)
+
+    @property
+    def secrets(self):
+        if self._merged is None:
+            merged = {}
+            for layer in self.layers:
+                merged = _merge(merged, layer.secrets)
+            self._merged = merged
+        return self._merged
+
+    def get(self, key, default=None):
+        from secrets_vault.vault import _is_simple_path
+
+        if not _is_simple_path(key):
+            import pydash
+
+            return pydash.get(self.secrets, key, default)
+
+        parts = key.split(".")
+        found = []
+        for i in reversed(range(len(self._layers))):
+            layer = self._layer(i)
+            value = layer.get(key, constants.UNSET)
+            if value is constants.UNSET:
+                if _shadowed(layer, parts):
+                    break
+                continue
+            if not isinstance(value, dict):
+                # a value replaces whatever lower layers define, and is overridden by dicts
+                if not found:
+                    return value
+                break
+            found.append(value)
+
+        if not found:
+            return default
+        merged = {}
+        for value in reversed(found):
+            merged = _merge(merged, value)
+        return merged
+
+    def require(self, key):
+        value = self.get(key, default=constants.UNSET)
+        if value is constants.UNSET:
+            raise KeyError(f"Secret {key} not found in secrets vaults")
+        return value
+
+    def get_many(self, keys, strict=False):
+        """
+        Get several secrets at once, see SecretsVault.get_many.
+        """
+        from secrets_vault.vault import _found
+
+        return _found(self._select(keys), strict)
+
+    def _select(self, keys):
+        from secrets_vault.vault import _select_keys
+
+        return _select_keys(self, keys)
+
+    def set(self, key, value):
+        self._check_writable()
+
+    def delete(self, key):
+        self._check_writable()
+
+    def save(self):
+        self._check_writable()
+
+    def _check_writable(self):
+        raise exceptions.ReadOnlyVault(
+            "Layered secrets vaults are read-only, open a single layer to change it"
+        )
+
+    def _layer(self, i):
+        if self._layers[i] is None:
+            with self._locks[i]:
+                if self._layers[i] is None:
+                    self._layers[i] = self._open(self.secrets_filenames[i])
+        return self._layers[i]
+
+    def _load_all(self):
+        pending = [i for i, layer in enumerate(self._layers) if layer is None]
+        if len(pending) < 2:
+            for i in pending:
+                self._layer(i)
+            return
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        # decryption releases the GIL, so layers are decrypted in parallel
+        with ThreadPoolExecutor(max_workers=self.workers or len(pending)) as pool:
+            list(pool.map(self._layer, pending))
+
+
+def _merge(base, override):
+    """
+    Deep merge override into a copy of base. Dicts are merged, anything else is replaced.
+    """
+    if not isinstance(base, dict) or not isinstance(override, dict):
+        return override
+    merged = dict(base)
+    for key, value in override.items():
+        merged[key] = _merge(merged[key], value) if key in merged else value
+    return merged
+
+
+def _shadowed(layer, parts):
+    """
+    Whether a layer replaces a parent of the key path with a value that is not a dict,
+    which hides the key in every lower layer.
+    """
+    for i in range(1, len(parts)):
+        value = layer.get(".".join(parts[:i]), constants.UNSET)
+        if value is constants.UNSET:
+            return False
+        if not isinstance(value, dict):
+            return True
+    return False
@@ -1,14 +1,14 @@
+import contextlib
+import copy
 import json
 import logging
 import os
-import subprocess
-import tempfile
 from io import BytesIO
-from pathlib import Path
 
-import pydash
-
-from secrets_vault import exceptions, constants, formatters
+from secrets_vault import backends, exceptions, constants, formatters, instrumentation
+from secrets_vault.cache import vault_cache
+from secrets_vault.files import atomic_write, file_identity, file_lock, stat_identity
+from secrets_vault.index import KeyIndex, walk
 
 log = logging.getLogger(__name__)
 
@@ -21,9 +21,20 @@ class SecretsVault:
         master_key_filepath=constants.DEFAULT_MASTER_KEY_FILEPATH,
         backend=constants.DEFAULT_BACKEND,
         file_format=constants.DEFAULT_FILE_FORMAT,
+        cache=False,
+        read_only=False,
+        container=None,
+        frozen=False,
     ):
         assert file_format in {"yaml", "json"}, "Format must be either 'yaml' or 'json'"
+        assert container in {None, *backends.CONTAINERS}, "Unknown container"
         self.file_format = file_format
+        self.cache = cache
+        # frozen vaults hold a compact immutable tree, see secrets_vault.frozen
+        self.frozen = frozen
+        self.read_only = read_only or frozen
+        # container written on save, None keeps the container of the file on disk
+        self.container = container
 
         if master_key is None:
             self.master_key = self._load_master_key(master_key_filepath)
@@ -31,9 +42,69 @@ class SecretsVault:
             self.master_key = master_key
         self.secrets_filename = secrets_filepath
         self.backend = backend(self.master_key)
+        # lazily decrypted entries when the file uses the entries container
+        self._entries = None
+        # position and size of the journal when the file uses the journal container
+        self._journal = None
         self.secrets = dict()
+        self._undo = None
+        self._digest = None
+        self._file_container = None
+        # the file as last loaded or saved, to detect and merge concurrent changes on save
+        self._identity = None
+        self._base_contents = None
         self.load()
 
+    @property
+    def secrets(self):
+        # the caller may change the tree in place, copy it first if shared with the cache
+        self._own_secrets()
+        self._expose()
+        return self._all_secrets()
+
+    @secrets.setter
+    def secrets(self, value):
+        self._secrets = value
+        self._index = None
+        # the caller holds the new tree, fresh trees of the vault reset this
+        self._exposed = True
+        self._shared = False
+        # keys changed since the file was loaded, None once the secrets are replaced wholesale
+        self._changes = None
+        if self._entries is not None:
+            # replaced wholesale, entries that were never decrypted are dropped
+            self._entries.pending.clear()
+
+    @classmethod
+    def open(cls, *args, cache=False, **kwargs):
+        """
+        Open an existing vault. With cache=True, repeated opens of an unchanged file with the
+        same master key are served from the process-wide cache instead of decrypting again.
+
+        A list of secrets files opens a read-only LayeredSecretsVault, where later files
+        override earlier ones.
+        """
+        import inspect
+
+        arguments = inspect.signature(cls).bind(*args, cache=cache, **kwargs).arguments
+        secrets_filepath = arguments.get("secrets_filepath")
+        if isinstance(secrets_filepath, (list, tuple)):
+            from secrets_vault.overlay import LayeredSecretsVault
+
+            del arguments["secrets_filepath"]
+            return LayeredSecretsVault(secrets_filepath, **arguments)
+        return cls(**arguments)
+
+    @classmethod
+    def watch(cls, *args, **kwargs):
+        """
+        Open a read-only vault that reloads itself in the background when the file changes,
+        see WatchedSecretsVault.
+        """
+        from secrets_vault.watch import WatchedSecretsVault
+
+        return WatchedSecretsVault(*args, **kwargs)
+
     @classmethod
     def create(
         cls,
@@ -41,6 +112,7 @@ class SecretsVault:
         master_key_filepath=constants.DEFAULT_MASTER_KEY_FILEPATH,
         backend=constants.AES256GCMBackend,
         file_format=constants.DEFAULT_FILE_FORMAT,
+        container=backends.CONTAINER_TEXT,
     ):
         """
         Create a new secrets file and returns the master key - keep it safe!
@@ -55,6 +127,7 @@ class SecretsVault:
             master_key=master_key,
             secrets_filepath=secrets_filepath,
             file_format=file_format,
+            container=container,
         )
 
         example = cls._get_example(file_format)
@@ -66,25 +139,148 @@ class SecretsVault:
 
     def require(self, key):
         value = self.get(key, default=constants.UNSET)
-        if value == constants.UNSET:
+        if value is constants.UNSET:
             raise KeyError(f"Secret {key} not found in secrets vault")
         return value
 
+    def get_many(self, keys, strict=False):
+        """
+        Get several secrets from a single load, as a {key: value} dict in the order of keys.
+        Keys may be glob patterns over dotted paths (eg. "aws.*"), which expand to every
+        matching value that is not a dict or list. Missing keys and patterns matching nothing
+        are left out, or raise KeyError like require() with strict=True.
+        """
+        return _found(self._select(keys), strict)
+
+    def _select(self, keys):
+        index = None
+        if (
+            not self.frozen
+            and not self._exposed
+            and any(_is_pattern(key) for key in keys)
+        ):
+            self._all_secrets()  # decrypt all entries, so they are indexed
+            index = self._get_index()
+        return _select_keys(self, keys, index)
+
     def get(self, key, default=None):
-        return pydash.get(self.secrets, key, default)
+        if instrumentation.hooks:
+            started = instrumentation.start()
+            value = self._get(key, default)
+            instrumentation.emit("lookup", started)
+        else:
+            value = self._get(key, default)
+        if isinstance(value, (dict, list)):
+            if self._shared:
+                self._own_secrets()
+                value = self._get(key, default)
+            self._expose()
+        return value
+
+    def _get(self, key, default):
+        self._load_entries_for(key)
+        secrets = self._secrets
+        if _is_simple_path(key):
+            if "." not in key and isinstance(secrets, dict):
+                # same lookup as pydash for top-level keys, including its integer key fallback
+                value = secrets.get(key, constants.UNSET)
+                if value is constants.UNSET:
+                    try:
+                        value = secrets.get(int(key), default)
+                    except ValueError:
+                        value = default
+                return value
+
+            if self.frozen or self._exposed:
+                # no flattened index of every path is kept for frozen vaults, nor trusted
+                # once the tree may have been changed in place
+                value = walk(secrets, key)
+            else:
+                value = self._get_index().get(key, constants.UNSET)
+            if value is not constants.UNSET:
+                return value
+
+        # escaped or bracketed paths, and misses that pydash may still resolve (eg. negative
+        # list indexes) go through the full path parser
+        import pydash
+
+        return pydash.get(secrets, key, default)
 
     def set(self, key, value):
-        pydash.set_(self.secrets, key, value)
+        self._check_writable()
+        self._own_secrets()
+        self._load_entries_for(key)
+        self._record_undo(key)
+        path = self._changed_path(key)
+        if isinstance(value, (dict, list)):
+            # the caller keeps the value, a copy can't be changed behind the vault's back
+            value = copy.deepcopy(value)
+        try:
+            _set_path(self._secrets, key, value)
+        finally:
+            self._refresh_index(key)
+        # pydash silently skips paths through None
+        if self._get(key, constants.UNSET) is value:
+            self._record_change(path)
         return self
 
     def delete(self, key):
-        pydash.unset(self.secrets, key)
+        self._check_writable()
+        self._own_secrets()
+        self._load_entries_for(key)
+        self._record_undo(key)
+        path = self._changed_path(key)
+        try:
+            deleted = _delete_path(self._secrets, key)
+        finally:
+            self._refresh_index(key)
+        if deleted:
+            self._record_change(path)
         return self
 
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Group several set/delete calls into a single save. The changes are saved once when the
+        block exits, or rolled back if it raises. Nested batches join the outermost one.
+        """
+        self._check_writable()
+        if self._undo is not None:
+            yield self
+            return
+
+        undo = self._undo = []
+        try:
+            yield self
+            self._undo = None
+            self.save()
+        except BaseException:
+            self._undo = None
+            for key, value in reversed(undo):
+                if value is constants.UNSET:
+                    self.delete(key)
+                else:
+                    self.set(key, value)
+            raise
+
+    def diff(self, other):
+        """
+        Changes from these secrets to the secrets of another vault (or a dict), as
+        (change, path, old value, new value) tuples where change is "added", "removed" or
+        "changed". Only branches whose digests differ are compared key by key.
+        """
+        from secrets_vault.diff import diff
+
+        return list(diff(self.secrets, getattr(other, "secrets", other)))
+
     def edit_secrets(self):
         """
         Decrypts and opens the secrets file in an editor. On save, the file is encrypted again.
         """
+        import subprocess
+        import tempfile
+
+        self._check_writable()
         editor = os.environ.get("EDITOR", "").split(" ")  # 'could be "code --wait"'
         if not editor:
             raise RuntimeError(
@@ -93,47 +289,493 @@ class SecretsVault:
 
         filedesc, filename = tempfile.mkstemp(suffix=".yml")
         try:
+            original = self._serialize(self._all_secrets())
             with open(filedesc, "w+b") as fout:
-                fout.write(self._serialize(self.secrets))
+                fout.write(original)
 
             status = subprocess.call([*editor, filename])
             if status != 0:
                 raise RuntimeError("Editor returned non-zero status code")
 
             with open(filename, "rb") as fin:
-                try:
-                    newsecrets = self._deserialize(fin.read())
-                except Exception as e:
-                    raise exceptions.MalformedSecretsFile(
-                        f"Could not parse secrets file: {e}"
-                    )
-
-            if self._serialize(newsecrets) == self._serialize(self.secrets):
+                edited = fin.read()
+
+            if _digest(edited) == _digest(original):
                 log.info("No changes detected")
                 return
 
+            try:
+                newsecrets = self._deserialize(edited)
+            except Exception as e:
+                raise exceptions.MalformedSecretsFile(
+                    f"Could not parse secrets file: {e}"
+                )
+
             self.secrets = newsecrets
             self.save()
         finally:
             os.remove(filename)
 
     def save(self):
-        with open(self.secrets_filename, "wb") as fout:
-            fout.write(self.backend.encrypt(self._serialize(self.secrets)))
+        """
+        Encrypt and atomically write the secrets to disk. Nothing is written if the serialized
+        secrets are identical to the contents last loaded from or saved to the file.
+
+        The vault lock is held while saving. If another process changed the file since it was
+        loaded, the keys changed here are merged into its current contents, or SecretsConflict
+        is raised if the same keys were changed on both sides.
+        """
+        self._check_writable()
+        with self.lock():
+            identity = file_identity(self.secrets_filename)
+            if identity is not None and identity != self._identity:
+                self._merge()
+                return
+
+            container = (
+                self.container or self._file_container or backends.CONTAINER_TEXT
+            )
+            if container == backends.CONTAINER_ENTRIES:
+                self._save_entries()
+                return
+            if container == backends.CONTAINER_JOURNAL:
+                self._save_journal()
+                return
+
+            plaintext = self._serialize(self._all_secrets())
+            digest = _digest(plaintext)
+            if (
+                digest == self._digest
+                and container == self._file_container
+                and os.path.exists(self.secrets_filename)
+            ):
+                log.info(f"No changes to save to {self.secrets_filename}")
+                self._changes = {}
+                return
+
+            contents = self.backend.encrypt(plaintext, container=container)
+            self._write(contents)
+            self._digest = digest
+            self._file_container = container
+            self._entries = None
+            self._journal = None
+            self._saved(contents)
+
+    def lock(self):
+        """
+        Exclusive advisory lock of the vault file, to wrap a whole load-modify-save cycle.
+        save() takes it too, the lock is reentrant within a thread.
+        """
+        return file_lock(self.secrets_filename)
+
+    def _save_entries(self):
+        if self._entries is None:
+            from secrets_vault.entries import EntryStore
+
+            self._entries = EntryStore.new(self)
+        changed, entries = self._entries.pack(self._secrets)
+        if (
+            not changed
+            and self._file_container == backends.CONTAINER_ENTRIES
+            and os.path.exists(self.secrets_filename)
+        ):
+            log.info(f"No changes to save to {self.secrets_filename}")
+            self._changes = {}
+            return
+
+        contents = self.backend.pack_entries(self._entries.header, entries)
+        self._write(contents)
+        self._entries.commit(entries)
+        self._digest = None
+        self._file_container = backends.CONTAINER_ENTRIES
+        self._journal = None
+        self._saved(contents)
+
+    def compact(self):
+        """
+        Fold the deltas of a journal vault into a new snapshot. save() compacts on its own
+        once the deltas outgrow the snapshot, or when the file is converted to a journal.
+        """
+        self._check_writable()
+        with self.lock():
+            identity = file_identity(self.secrets_filename)
+            if identity is not None and identity != self._identity:
+                self._merge()
+            self._write_snapshot()
+
+    def _save_journal(self):
+        journal = self._journal
+        if (
+            journal is None
+            or self._file_container != backends.CONTAINER_JOURNAL
+            or self._changes is None
+        ):
+            # a new journal, a conversion, or the secrets were replaced wholesale
+            self._write_snapshot()
+            return
+        if not self._changes:
+            log.info(f"No changes to save to {self.secrets_filename}")
+            return
+
+        from secrets_vault.journal import operations
+
+        delta = self._serialize(operations(self, self._changes))
+        if journal.should_compact(len(delta)):
+            self._write_snapshot()
+            return
+
+        record = self.backend.seal_journal_record(
+            journal.header, journal.deltas + 1, delta
+        )
+        started = instrumentation.start()
+        with open(self.secrets_filename, "r+b") as fout:
+            # overwrites the incomplete record of a writer that crashed, if any
+            fout.seek(journal.length)
+            fout.write(record)
+            fout.truncate()
+            fout.flush()
+            os.fsync(fout.fileno())
+        instrumentation.emit("write", started, len(record))
+        self._journal = journal.appended(len(delta), len(record))
+        self._saved(self._base_contents[: journal.length] + record)
+
+    def _write_snapshot(self):
+        from secrets_vault.journal import Journal
+
+        snapshot = self._serialize(self._all_secrets())
+        header = self.backend.new_journal_header()
+        contents = header + self.backend.seal_journal_record(header, 0, snapshot)
+        self._write(contents)
+        self._journal = Journal(header, len(contents), snapshot_size=len(snapshot))
+        self._digest = None
+        self._file_container = backends.CONTAINER_JOURNAL
+        self._entries = None
+        self._saved(contents)
+
+    def _write(self, contents):
+        started = instrumentation.start()
+        with atomic_write(self.secrets_filename) as fout:
+            fout.write(contents)
+        instrumentation.emit("write", started, len(contents))
+
+    def _saved(self, contents):
         log.info(f"Wrote encrypted secrets to {self.secrets_filename}")
+        self._identity = file_identity(self.secrets_filename)
+        self._base_contents = contents
+        self._changes = {}
+        vault_cache.invalidate(self.secrets_filename)
+        if self.cache:
+            self._cache_put(os.stat(self.secrets_filename))
+
+    def _merge(self):
+        """
+        Save on top of a file that was changed by someone else since it was loaded: apply the
+        keys changed here to the current contents of the file, unless they changed there too.
+        """
+        log.info(f"{self.secrets_filename} changed since it was loaded, merging")
+        with open(self.secrets_filename, "rb") as fin:
+            theirs = self._sibling(fin.read(), os.fstat(fin.fileno()))
+        if self._changes is None:
+            raise exceptions.SecretsConflict(
+                f"{self.secrets_filename} changed since it was loaded and the secrets "
+                "were replaced here, reload the vault and apply the changes again"
+            )
+
+        base = self._sibling(self._base_contents or b"")
+        conflicts = []
+        changes = []
+        for key in self._changes:
+            if _covered(key, self._changes):
+                # compared and applied with the changed ancestor holding it
+                continue
+            ours = self._get(key, constants.UNSET)
+            before = base._get(key, constants.UNSET)
+            if ours == before:
+                continue
+            current = theirs._get(key, constants.UNSET)
+            if current != before and current != ours:
+                conflicts.append(key)
+            changes.append((key, ours))
+        if conflicts:
+            raise exceptions.SecretsConflict(
+                f"{self.secrets_filename} changed since it was loaded, "
+                f"conflicting changes to: {', '.join(map(str, conflicts))}",
+                keys=conflicts,
+            )
+
+        for key, value in sorted(changes, key=lambda change: change[0].count(".")):
+            if value is constants.UNSET:
+                theirs.delete(key)
+                continue
+            try:
+                theirs.set(key, value)
+            except (AttributeError, TypeError):
+                pass
+            if theirs._get(key, constants.UNSET) != value:
+                # a parent of the key is no longer a dict or list there
+                raise exceptions.SecretsConflict(
+                    f"{self.secrets_filename} changed since it was loaded, "
+                    f"conflicting changes to: {key}",
+                    keys=[key],
+                )
+        theirs.container = self.container
+        theirs.save()
+        self._adopt(theirs)
+        if self.cache:
+            self._cache_put(os.stat(self.secrets_filename))
 
     def load(self):
         log.info(f"Loading encrypted secrets from {self.secrets_filename}")
+        self._entries = None
         if not os.path.exists(self.secrets_filename):
             raise exceptions.SecretsFileNotFound(
                 f"Could not find secrets file {self.secrets_filename}"
             )
+        if self.cache:
+            stat = os.stat(self.secrets_filename)
+            cached = vault_cache.get(self._cache_key(stat))
+            if cached is not None:
+                log.info(f"Loaded secrets from cache for {self.secrets_filename}")
+                (
+                    self.secrets,
+                    self._digest,
+                    self._file_container,
+                    self._base_contents,
+                    self._journal,
+                ) = cached
+                self._identity = stat_identity(stat)
+                self._changes = {}
+                self._shared = True
+                self._exposed = False
+                return
+
+        started = instrumentation.start()
         with open(self.secrets_filename, "rb") as fin:
             contents = fin.read()
-            if contents:
-                self.secrets = self._deserialize(self.backend.decrypt(contents))
-            else:
-                self.secrets = dict()
+            # stat the open file so the cache key matches the bytes we actually read
+            stat = os.fstat(fin.fileno())
+        instrumentation.emit("read", started, len(contents))
+        self._load_contents(contents, stat)
+
+        if self.cache:
+            self._cache_put(stat)
+
+    def _load_contents(self, contents, stat=None):
+        container = self.backend.detect_container(contents)
+        self._journal = None
+        if container == backends.CONTAINER_ENTRIES:
+            # only the manifest is decrypted here, entries are decrypted on first access
+            from secrets_vault.entries import EntryStore
+
+            self.secrets = self._new_mapping()
+            self._entries = EntryStore.unpack(self, contents)
+            self._digest = None
+            self._file_container = backends.CONTAINER_ENTRIES
+        elif container == backends.CONTAINER_JOURNAL:
+            from secrets_vault.journal import Journal
+
+            self._journal, self.secrets = Journal.unpack(self, contents)
+            self._digest = None
+            self._file_container = backends.CONTAINER_JOURNAL
+        elif contents:
+            plaintext = self.backend.decrypt(contents)
+            try:
+                self.secrets = self._deserialize(plaintext)
+            except Exception as e:
+                raise exceptions.MalformedSecretsFile(
+                    f"Could not parse secrets file: {e}"
+                )
+            self._digest = _digest(plaintext)
+            self._file_container = container
+        else:
+            self.secrets = dict()
+            self._digest = None
+            self._file_container = None
+        self._identity = stat_identity(stat) if stat is not None else None
+        self._base_contents = contents
+        self._changes = {}
+        self._exposed = False
+        if self.frozen:
+            self._freeze()
+
+    def _freeze(self):
+        from secrets_vault.frozen import freeze
+
+        # entries are all decrypted up front, the frozen tree can't be filled in later
+        secrets = self._all_secrets()
+        self._entries = None
+        self.secrets = freeze(secrets)
+        self._changes = {}
+        # only kept to merge concurrent changes on save, which frozen vaults never do
+        self._base_contents = None
+
+    def _cache_key(self, stat):
+        return vault_cache.make_key(
+            self.secrets_filename,
+            stat,
+            self.master_key,
+            self.file_format,
+            self.read_only,
+            self.frozen,
+        )
+
+    def _cache_put(self, stat):
+        vault_cache.put(
+            self._cache_key(stat),
+            (
+                self._all_secrets(),
+                self._digest,
+                self._file_container,
+                self._base_contents,
+                self._journal,
+            ),
+        )
+        self._shared = True
+
+    def _sibling(self, contents, stat=None):
+        """
+        Return a vault with the same settings, loaded from the given encrypted contents.
+        """
+        vault = copy.copy(self)
+        vault.cache = False
+        vault._undo = None
+        vault._entries = None
+        vault._load_contents(contents, stat)
+        return vault
+
+    def _adopt(self, other):
+        """
+        Take over the loaded state of another vault of the same file.
+        """
+        for name in (
+            "_secrets",
+            "_index",
+            "_exposed",
+            "_shared",
+            "_entries",
+            "_journal",
+            "_digest",
+            "_file_container",
+            "_identity",
+            "_base_contents",
+            "_changes",
+        ):
+            setattr(self, name, getattr(other, name))
+        if self._entries is not None:
+            self._entries.vault = self
+
+    def _clone(self):
+        """
+        Return a vault sharing the loaded secrets, both copy them before their first change.
+        """
+        self._all_secrets()  # decrypt any remaining entries, so the clones don't share pending ones
+        clone = copy.copy(self)
+        clone._undo = None
+        clone._index = None
+        if self._changes is not None:
+            clone._changes = dict(self._changes)
+        self._shared = clone._shared = True
+        return clone
+
+    def _load_entries_for(self, key):
+        if self._entries is not None:
+            self._entries.load_for(self._secrets, key)
+
+    def _own_secrets(self):
+        # secrets handed out by the cache are shared, copy them before the first mutation or
+        # before handing out any of their dicts and lists
+        if self._shared:
+            changes = self._changes
+            self.secrets = copy.deepcopy(self._all_secrets())
+            self._changes = changes
+            # nobody else holds the copy
+            self._exposed = False
+
+    def _record_change(self, path):
+        if self._changes is None:
+            return
+        if path is None:
+            # can't be addressed on its own, save and merge as if replaced wholesale
+            self._changes = None
+            return
+        self._changes[path] = None
+
+    def _changed_path(self, key):
+        """
+        The path whose value a set or delete of key changes: the list holding an indexed
+        item, since list items shift on delete, or key itself. Bracketed paths may index
+        lists too, they change their whole top-level entry, or None if it can't be addressed
+        on its own.
+        """
+        if not _is_simple_path(key):
+            import pydash
+
+            path = pydash.to_path(key)[0]
+            return path if _is_flat_key(path) else None
+
+        parts = key.split(".")
+        for i in range(1, len(parts)):
+            path = ".".join(parts[:i])
+            value = self._get(path, constants.UNSET)
+            if isinstance(value, list):
+                return path
+            if not isinstance(value, dict):
+                return key
+        return key
+
+    def _record_undo(self, key):
+        if self._undo is None:
+            return
+        # remember the shallowest node the mutation can replace or create, so intermediate
+        # dicts created by set() are removed again on rollback
+        parts = key.split(".") if _is_simple_path(key) else [key]
+        for i in range(1, len(parts) + 1):
+            path = ".".join(parts[:i])
+            value = self._get(path, constants.UNSET)
+            if isinstance(value, list) and i < len(parts):
+                # list items shift on delete, so restore the whole list
+                self._undo.append((path, copy.deepcopy(value)))
+                return
+            if (
+                value is constants.UNSET
+                or i == len(parts)
+                or not isinstance(value, dict)
+            ):
+                self._undo.append((path, value))
+                return
+
+    def _all_secrets(self):
+        if self._entries is not None:
+            self._entries.load_all(self._secrets)
+        return self._secrets
+
+    def _expose(self):
+        # the caller holds a container of the tree and may change it in place, which neither
+        # the key index nor the recorded changes can notice: lookups walk the tree instead
+        # and the next save writes all secrets, until the next load
+        self._exposed = True
+        self._index = None
+        self._changes = None
+
+    def _get_index(self) -> KeyIndex:
+        # built on first lookup, only trusted while the tree isn't exposed, see _expose()
+        if self._index is None:
+            self._index = KeyIndex(self._secrets)
+        return self._index
+
+    def _refresh_index(self, key):
+        if self._index is None:
+            return
+        if _is_simple_path(key):
+            self._index.refresh(self._secrets, key)
+        else:
+            self._index = None
+
+    def _check_writable(self):
+        if self.read_only:
+            raise exceptions.ReadOnlyVault(
+                f"Secrets vault {self.secrets_filename} was opened in read-only mode"
+            )
 
     @staticmethod
     def _load_master_key(master_key_filepath=None) -> str:
@@ -143,7 +785,7 @@ class SecretsVault:
             and master_key_filepath
             and os.path.exists(master_key_filepath)
         ):
-            with open(Path(master_key_filepath).absolute(), "r") as fin:
+            with open(os.path.abspath(master_key_filepath), "r") as fin:
                 master_key = fin.read().strip()
         if not master_key:
             raise exceptions.MasterKeyNotFound(
@@ -153,25 +795,45 @@ class SecretsVault:
         return master_key
 
     def _deserialize(self, data: bytes) -> dict:
-        if self.file_format in {"yaml", "json"}:
+        started = instrumentation.start()
+        if self.file_format == "json":
+            result = json.loads(data)
+        elif self.file_format == "yaml":
             fin = BytesIO(data)
-            return formatters.yaml.load(fin)
-        raise NotImplementedError(f"Unknown file_format {self.file_format}")
+            if self.read_only:
+                result = formatters.safe_yaml.load(fin)
+            else:
+                result = formatters.yaml.load(fin)
+        else:
+            raise NotImplementedError(f"Unknown file_format {self.file_format}")
+        instrumentation.emit("parse", started, len(data))
+        return result
+
+    def _new_mapping(self) -> dict:
+        if self.file_format == "yaml" and not self.read_only:
+            from ruamel.yaml.comments import CommentedMap
+
+            return CommentedMap()
+        return dict()
 
     def _serialize(self, data: dict) -> bytes:
+        started = instrumentation.start()
         if self.file_format == "json":
-            return json.dumps(data, indent=4).encode()
+            result = json.dumps(data, indent=4).encode()
         elif self.file_format == "yaml":
             fout = BytesIO()
             formatters.yaml.dump(data, fout)
             result = fout.getvalue()
             fout.close()
-            return result
-
-        raise NotImplementedError(f"Unknown file_format {self.file_format}")
+        else:
+            raise NotImplementedError(f"Unknown file_format {self.file_format}")
+        instrumentation.emit("serialize", started, len(result))
+        return result
 
     @classmethod
     def _prepare_dirs(cls, master_key_filepath, secrets_filepath):
+        from pathlib import Path
+
         if Path(secrets_filepath).exists():
             raise exceptions.SecretsFileAlreadyExists(
                 f"Secrets file {secrets_filepath} already exists"
@@ -187,3 +849,100 @@ class SecretsVault:
             return constants.EXAMPLE_SECRETS_JSON
         elif file_format == "yaml":
             return constants.EXAMPLE_SECRETS_YAML
+
+
+def _digest(plaintext: bytes) -> bytes:
+    import hashlib
+
+    return hashlib.sha256(plaintext).digest()
+
+
+def _is_pattern(key) -> bool:
+    return isinstance(key, str) and ("*" in key or "?" in key)
+
+
+def _select_keys(vault, keys, index=None):
+    """
+    (key, value) pairs for get_many, in the order of keys. Patterns expand to the matching
+    leaf paths, keys and patterns without a value give (key, UNSET).
+    """
+    import fnmatch
+    import re
+
+    pairs = []
+    leaves = None
+    for key in keys:
+        if not _is_pattern(key):
+            pairs.append((key, vault.get(key, constants.UNSET)))
+            continue
+        if leaves is None:
+            index = index or KeyIndex(vault.secrets)
+            leaves = [
+                (path, index.get(path))
+                for path in index.paths()
+                if not isinstance(index.get(path), (dict, list, tuple))
+            ]
+        # brackets are list indexes in key paths, not character classes
+        match = re.compile(fnmatch.translate(key.replace("[", "[[]"))).match
+        matches = [(path, value) for path, value in leaves if match(path)]
+        pairs.extend(matches or [(key, constants.UNSET)])
+    return pairs
+
+
+def _found(pairs, strict=False):
+    values = {}
+    for key, value in pairs:
+        if value is constants.UNSET:
+            if strict:
+                raise KeyError(f"Secret {key} not found in secrets vault")
+            continue
+        values[key] = value
+    return values
+
+
+def _set_path(secrets, key, value):
+    if _is_flat_key(key):
+        secrets[key] = value
+    else:
+        import pydash
+
+        pydash.set_(secrets, key, value)
+
+
+def _delete_path(secrets, key) -> bool:
+    """
+    Delete the value at key, returns whether there was one.
+    """
+    if _is_flat_key(key):
+        return secrets.pop(key, constants.UNSET) is not constants.UNSET
+    import pydash
+
+    return pydash.unset(secrets, key)
+
+
+def _covered(key, keys) -> bool:
+    """
+    Whether a dotted prefix of key is in keys, ie. an ancestor of key changed too.
+    """
+    end = key.find(".")
+    while end >= 0:
+        if key[:end] in keys:
+            return True
+        end = key.find(".", end + 1)
+    return False
+
+
+def _is_flat_key(key) -> bool:
+    """
+    Whether key addresses a top-level secret directly, without any pydash path syntax.
+    """
+    return _is_simple_path(key) and "." not in key
+
+
+def _is_simple_path(key) -> bool:
+    """
+    Whether key is a plain dotted path, without pydash escapes or brackets.
+    """
+    return (
+        isinstance(key, str) and "[" not in key and "]" not in key and "\\" not in key
+    )
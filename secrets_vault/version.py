@@ -1,3 +1,8 @@
-from importlib.metadata import version
+def __getattr__(name):
+    # resolved lazily, importlib.metadata is slow to import and only needed by `secrets version`
+    if name == "__version__":
+        from importlib.metadata import version
 
-__version__ = version("secrets_vault")
+        globals()["__version__"] = version("secrets_vault")
+        return globals()["__version__"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
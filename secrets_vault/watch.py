@@ -0,0 +1,220 @@
+import logging
+import os
+import struct
+import threading
+import time
+
+from secrets_vault import exceptions
+from secrets_vault.files import file_identity
+
+log = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 1.0
+
+# from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class WatchedSecretsVault:
+    """
+    Read-only vault that reloads itself when the file on disk changes.
+
+    The new file is decrypted and parsed on a background thread into a fresh SecretsVault,
+    which then replaces the current one in a single assignment. Readers never block and
+    always see either the previous or the new secrets, never a partially loaded vault.
+    Changes are picked up with inotify on Linux, and by polling the file otherwise.
+
+        vault = WatchedSecretsVault(secrets_filepath="./secrets.yml.enc")
+        vault.on_change(lambda vault: log.info("Secrets reloaded"))
+        vault.get("database-url")
+    """
+
+    def __init__(
+        self, *args, poll_interval=DEFAULT_POLL_INTERVAL, inotify=None, **kwargs
+    ):
+        from secrets_vault.vault import SecretsVault
+
+        kwargs["read_only"] = True
+        self._open = lambda: SecretsVault(*args, **kwargs)
+        self.poll_interval = poll_interval
+        self.callbacks = []
+        # counters, updated by the watcher thread
+        self.reloads = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_reload_latency = None
+
+        self.vault = self._load()
+        self.secrets_filename = self.vault.secrets_filename
+        self._identity = file_identity(self.secrets_filename)
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._inotify = (
+            None if inotify is False else _Inotify.open(self.secrets_filename)
+        )
+        if inotify and self._inotify is None:
+            raise OSError("inotify is not available on this platform")
+        self._thread = threading.Thread(
+            target=self._watch, name=f"watch {self.secrets_filename}", daemon=True
+        )
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def secrets(self):
+        return self.vault.secrets
+
+    def get(self, key, default=None):
+        return self.vault.get(key, default)
+
+    def require(self, key):
+        return self.vault.require(key)
+
+    def on_change(self, callback):
+        """
+        Call callback(vault) from the watcher thread after every successful reload.
+        """
+        self.callbacks.append(callback)
+        return callback
+
+    def reload(self):
+        """
+        Load the file now if it changed since the last reload. Returns whether it did.
+        """
+        with self._reload_lock:
+            return self._reload()
+
+    def _reload(self):
+        identity = file_identity(self.secrets_filename)
+        if identity == self._identity:
+            return False
+
+        start = time.perf_counter()
+        # remember the file even if it fails to load, so it is only retried once it changes
+        self._identity = identity
+        try:
+            vault = self._load()
+        except (exceptions.SecretsStoreException, OSError) as e:
+            self.errors += 1
+            self.last_error = e
+            log.error(f"Could not reload {self.secrets_filename}: {e}")
+            return False
+
+        self.vault = vault
+        self.reloads += 1
+        self.last_reload_latency = time.perf_counter() - start
+        log.info(f"Reloaded {self.secrets_filename}")
+        for callback in list(self.callbacks):
+            try:
+                callback(vault)
+            except Exception:
+                log.exception("Secrets change callback failed")
+        return True
+
+    def close(self):
+        self._stop.set()
+        if self._inotify is not None:
+            self._inotify.wakeup()
+        self._thread.join()
+        if self._inotify is not None:
+            self._inotify.close()
+
+    def _load(self):
+        vault = self._open()
+        # finish all lazy work here, so readers of the new vault never write to it: this
+        # decrypts any pending entries and copies secrets shared with the cache, and as the
+        # tree is now handed out, lookups walk it instead of building the key index
+        vault.secrets
+        return vault
+
+    def _watch(self):
+        while not self._stop.is_set():
+            if self._inotify is not None:
+                self._inotify.wait(self.poll_interval)
+            else:
+                self._stop.wait(self.poll_interval)
+            if not self._stop.is_set():
+                # with inotify, the periodic check still catches events that were missed
+                self.reload()
+
+
+class _Inotify:
+    """
+    Minimal inotify watch on the directory of a file through ctypes. Watching the directory
+    also sees the file being replaced by a rename, as atomic saves do.
+    """
+
+    def __init__(self, libc, fd, filename):
+        self.libc = libc
+        self.fd = fd
+        self.filename = os.fsencode(filename)
+        self._wakeup_read, self._wakeup_write = os.pipe()
+
+    @classmethod
+    def open(cls, filepath):
+        import ctypes
+        import ctypes.util
+        import sys
+
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+
+        directory = os.path.dirname(os.path.abspath(filepath))
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+            os.close(fd)
+            return None
+        return cls(libc, fd, os.path.basename(filepath))
+
+    def wait(self, timeout):
+        """
+        Wait up to timeout seconds for an event on the watched file.
+        """
+        import select
+
+        deadline = time.monotonic() + timeout
+        while (remaining := deadline - time.monotonic()) > 0:
+            readable, _, _ = select.select(
+                [self.fd, self._wakeup_read], [], [], remaining
+            )
+            if self._wakeup_read in readable or self._matches(self._read_events()):
+                return
+
+    def wakeup(self):
+        os.write(self._wakeup_write, b"\0")
+
+    def close(self):
+        for fd in (self.fd, self._wakeup_read, self._wakeup_write):
+            os.close(fd)
+
+    def _read_events(self):
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + INOTIFY_EVENT.size <= len(data):
+            _, _, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            yield data[offset : offset + length].rstrip(b"\0")
+            offset += length
+
+    def _matches(self, names):
+        return any(name == self.filename for name in names)
@@ -1,3 +1,6 @@
+import os
+import sys
+
 import invoke
 
 
@@ -16,6 +19,43 @@ def test(ctx):
     ctx.run("pytest -v -s")
 
 
+@invoke.task(
+    iterable=["threshold"],
+    help={
+        "sizes": "Comma-separated vault sizes in keys, eg. 10,1000",
+        "baseline": "Results file to compare against",
+        "threshold": "Allowed slowdown ratio, eg. 0.25 or load=0.5. Can be repeated",
+        "save_baseline": "Store the results as the new baseline",
+    },
+)
+def bench(
+    ctx,
+    sizes=None,
+    output="bench-results.json",
+    baseline="benchmarks/baseline.json",
+    threshold=None,
+    save_baseline=False,
+):
+    cmds = ["python", "benchmarks/suite.py", "--output", output]
+    if sizes:
+        cmds.extend(["--sizes", sizes])
+    compare = not save_baseline and os.path.exists(baseline)
+    if save_baseline:
+        cmds.extend(["--save-baseline", baseline])
+    elif compare:
+        cmds.extend(["--baseline", baseline])
+    for value in threshold or []:
+        cmds.extend(["--threshold", value])
+    ctx.run(" ".join(cmds))
+    if not save_baseline and not compare:
+        # baselines are machine specific and not committed, say loudly that nothing was checked
+        print(
+            f"WARNING: no baseline at {baseline}, regressions were NOT checked. "
+            "Run `invoke bench --save-baseline` before making changes to store one.",
+            file=sys.stderr,
+        )
+
+
 @invoke.task
 def clean(ctx):
     ctx.run("rm -rf dist")
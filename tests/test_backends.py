@@ -1,5 +1,8 @@
+import os
+from io import BytesIO
+
 from secrets_vault import exceptions
-from secrets_vault.backends import AES256GCMBackend
+from secrets_vault.backends import SEGMENTED_MAGIC, AES256GCMBackend
 
 backend = AES256GCMBackend
 
@@ -77,3 +80,148 @@ def test_empty_key():
         assert False, "Should throw"
     except Exception as e:
         assert isinstance(e, exceptions.MasterKeyInvalid)
+
+
+def test_segmented_roundtrip():
+    key = backend.generate_master_key()
+    cipher = backend(key)
+    segment_size = 64
+
+    for size in [0, 1, 63, 64, 65, 64 * 10, 64 * 10 + 7]:
+        contents = os.urandom(size)
+        ct = cipher.encrypt(contents, container="segmented", segment_size=segment_size)
+        assert ct.startswith(SEGMENTED_MAGIC)
+        assert backend.detect_container(ct) == "segmented"
+        assert cipher.decrypt(ct) == contents
+        assert backend(key, workers=1).decrypt(ct) == contents
+
+        fout = BytesIO()
+        backend(key).decrypt_stream(BytesIO(ct), fout)
+        assert fout.getvalue() == contents
+
+        streamed = BytesIO()
+        cipher.encrypt_stream(BytesIO(contents), streamed, segment_size=segment_size)
+        assert cipher.decrypt(streamed.getvalue()) == contents
+
+
+def test_segmented_tampering():
+    key = backend.generate_master_key()
+    cipher = backend(key)
+    segment_size = 64
+    stride = segment_size + 16
+    header_size = 32
+    ct = cipher.encrypt(
+        os.urandom(segment_size * 4), container="segmented", segment_size=segment_size
+    )
+    segments = [
+        ct[header_size + i * stride : header_size + (i + 1) * stride] for i in range(4)
+    ]
+
+    tampered = [
+        # truncated at a segment boundary
+        ct[: header_size + 3 * stride],
+        # truncated mid-segment
+        ct[:-1],
+        # reordered segments
+        ct[:header_size] + segments[1] + segments[0] + segments[2] + segments[3],
+        # flipped bit in a segment
+        ct[:-1] + bytes([ct[-1] ^ 1]),
+        # header with a different nonce prefix
+        ct[: header_size - 1] + bytes([ct[header_size - 1] ^ 1]) + ct[header_size:],
+        # no segments at all
+        ct[:header_size],
+    ]
+    for contents in tampered:
+        try:
+            cipher.decrypt(contents)
+            assert False, "Should throw"
+        except Exception as e:
+            assert isinstance(e, exceptions.MasterKeyInvalid)
+
+    try:
+        backend(backend.generate_master_key()).decrypt(ct)
+        assert False, "Should throw"
+    except Exception as e:
+        assert isinstance(e, exceptions.MasterKeyInvalid)
+
+
+def test_entries_are_bound_to_their_name():
+    cipher = backend(backend.generate_master_key())
+    header = cipher.new_entries_header()
+    contents = cipher.pack_entries(
+        header,
+        [
+            ("a", cipher.seal_entry(header, "a", b"a: 1\n")),
+            ("b", cipher.seal_entry(header, "b", b"b: 2\n")),
+        ],
+    )
+    header, entries = cipher.unpack_entries(contents)
+    assert [name for name, _, _ in entries] == ["a", "b"]
+    assert cipher.open_entry(header, *entries[1]) == b"b: 2\n"
+
+    try:
+        cipher.open_entry(header, "a", entries[1][1])
+        assert False, "Should throw"
+    except exceptions.MasterKeyInvalid:
+        pass
+
+
+def test_binary_container():
+    key = backend.generate_master_key()
+    cipher = backend(key)
+    contents = os.urandom(1024)
+    ct = cipher.encrypt(contents, container="binary")
+    assert ct.startswith(b"\x00SVB")
+    assert backend.detect_container(ct) == "binary"
+    assert len(ct) == 5 + 12 + len(contents) + 16
+    assert cipher.decrypt(ct) == contents
+
+    # the header is authenticated
+    for tampered in (b"\x00SVB\x02" + ct[5:], ct[:5] + b"\x00" + ct[6:], ct[:20]):
+        try:
+            cipher.decrypt(tampered)
+            assert False, "Should throw"
+        except exceptions.MasterKeyInvalid:
+            pass
+
+
+def test_text_container_lines():
+    cipher = backend(backend.generate_master_key())
+    ct = cipher.encrypt(os.urandom(1000))
+    lines = ct.split(b"\n")
+    assert all(len(line) == 80 for line in lines[:-1])
+    assert 0 < len(lines[-1]) <= 80
+
+    # vaults written by older versions may be wrapped differently
+    unwrapped = b"".join(lines)
+    rewrapped = b"\n".join(unwrapped[i : i + 64] for i in range(0, len(unwrapped), 64))
+    assert cipher.decrypt(rewrapped + b"\n") == cipher.decrypt(ct)
+
+
+def test_invalid_key_fails_fast():
+    for key in (None, "", "not hex", "abcd"):
+        try:
+            backend(key)
+            assert False, "Should throw"
+        except exceptions.MasterKeyInvalid:
+            pass
+
+
+def test_encrypt_many():
+    key = backend.generate_master_key()
+    cipher = backend(key)
+    contents = [os.urandom(size) for size in range(0, 5000, 250)]
+
+    for container in ("text", "binary", "segmented"):
+        cts = cipher.encrypt_many(contents, container=container)
+        assert [backend.detect_container(ct) for ct in cts] == [container] * len(cts)
+        assert cipher.decrypt_many(cts) == contents
+        assert backend(key, workers=1).decrypt_many(cts) == contents
+
+    cts = cipher.encrypt_many(contents)
+    cts[3] = backend(backend.generate_master_key()).encrypt(contents[3])
+    try:
+        cipher.decrypt_many(cts, workers=4)
+        assert False, "Should throw"
+    except exceptions.MasterKeyInvalid:
+        pass
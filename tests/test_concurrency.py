@@ -0,0 +1,205 @@
+import multiprocessing
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from secrets_vault import SecretsVault, exceptions
+from secrets_vault.__main__ import cli
+
+BASE_DIR = Path(__file__).parent
+TEST_DATA_DIR = BASE_DIR / "test-data"
+
+PROCESSES = 8
+WRITES = 10
+
+
+def open_vault(name, **kwargs):
+    return SecretsVault(
+        secrets_filepath=TEST_DATA_DIR / f"secrets-{name}.yml.enc",
+        master_key_filepath=TEST_DATA_DIR / f"master-{name}.key",
+        **kwargs,
+    )
+
+
+def create_vault(name, **kwargs):
+    SecretsVault.create(
+        secrets_filepath=TEST_DATA_DIR / f"secrets-{name}.yml.enc",
+        master_key_filepath=TEST_DATA_DIR / f"master-{name}.key",
+        **kwargs,
+    )
+
+
+def test_merges_concurrent_changes():
+    create_vault("conc-1")
+    ours = open_vault("conc-1")
+    theirs = open_vault("conc-1")
+
+    theirs.set("app.secret-key", "theirs").set("shared", "same").save()
+    ours.set("app.other-key", "ours").set("shared", "same")
+    ours.delete("database-url")
+    ours.save()
+
+    vault = open_vault("conc-1")
+    assert vault.get("app") == {"secret-key": "theirs", "other-key": "ours"}
+    assert vault.get("shared") == "same"
+    assert vault.get("database-url") is None
+    # comments of the file are kept
+    assert vault._serialize(vault.secrets).startswith(b"# Add your secrets below")
+
+    # ours is up to date with the file again
+    assert ours.secrets == vault.secrets
+    ours.set("next", "1").save()
+    assert open_vault("conc-1").get("app.secret-key") == "theirs"
+
+
+def test_conflicting_changes():
+    create_vault("conc-2")
+    ours = open_vault("conc-2")
+    theirs = open_vault("conc-2")
+
+    theirs.set("database-url", "theirs").save()
+    ours.set("database-url", "ours").set("other", "value")
+    try:
+        ours.save()
+        assert False, "Should throw"
+    except exceptions.SecretsConflict as e:
+        assert e.keys == ["database-url"]
+    assert open_vault("conc-2").get("database-url") == "theirs"
+
+    # a batch is rolled back on conflict
+    ours = open_vault("conc-2")
+    theirs.set("app.secret-key", "theirs").save()
+    try:
+        with ours.batch():
+            ours.set("app", {"secret-key": "ours"})
+        assert False, "Should throw"
+    except exceptions.SecretsConflict:
+        pass
+    assert ours.get("app") is None
+
+    # secrets replaced wholesale can't be merged
+    ours = open_vault("conc-2")
+    theirs.set("another", "1").save()
+    ours.secrets = {"replaced": True}
+    try:
+        ours.save()
+        assert False, "Should throw"
+    except exceptions.SecretsConflict:
+        pass
+
+
+def test_merges_entries_container():
+    create_vault("conc-3", container="entries")
+    ours = open_vault("conc-3")
+    theirs = open_vault("conc-3")
+
+    theirs.set("theirs", "1").save()
+    ours.set("ours", "2").save()
+    vault = open_vault("conc-3")
+    assert vault.get("theirs") == "1"
+    assert vault.get("ours") == "2"
+    with open(TEST_DATA_DIR / "secrets-conc-3.yml.enc", "rb") as fin:
+        assert fin.read().startswith(b"\x00SVE")
+
+
+def test_merges_list_item_changes():
+    create_vault("conc-6")
+    open_vault("conc-6").set("admins", ["a", "b", "c"]).save()
+    ours = open_vault("conc-6")
+    theirs = open_vault("conc-6")
+
+    theirs.set("other", "theirs").save()
+    # items shift on delete, the whole list is merged
+    ours.delete("admins.0")
+    ours.delete("admins.1")
+    ours.save()
+
+    vault = open_vault("conc-6")
+    assert vault.get("admins") == ["b"]
+    assert vault.get("other") == "theirs"
+    assert ours.secrets == vault.secrets
+
+
+def test_merges_nested_changes():
+    create_vault("conc-7")
+    open_vault("conc-7").set("a.b", 1).save()
+    ours = open_vault("conc-7")
+    theirs = open_vault("conc-7")
+
+    theirs.set("other", "theirs").save()
+    ours.delete("a.b.c")
+    ours.set("a", {"b": {"c": 3}})
+    ours.save()
+    vault = open_vault("conc-7")
+    assert vault.get("a") == {"b": {"c": 3}}
+    assert vault.get("other") == "theirs"
+
+    # a parent turned into a value there can't be merged into
+    ours = open_vault("conc-7")
+    theirs = open_vault("conc-7")
+    theirs.set("a.b", "value").save()
+    ours.set("a.b.d", 4)
+    try:
+        ours.save()
+        assert False, "Should throw"
+    except exceptions.SecretsConflict as e:
+        assert e.keys == ["a.b.d"]
+    assert open_vault("conc-7").get("a.b") == "value"
+
+
+def test_in_place_changes_conflict():
+    create_vault("conc-8")
+    ours = open_vault("conc-8")
+    theirs = open_vault("conc-8")
+
+    theirs.set("other", "theirs").save()
+    ours.secrets["api-token"] = "new"
+    try:
+        ours.save()
+        assert False, "Should throw"
+    except exceptions.SecretsConflict:
+        pass
+    vault = open_vault("conc-8")
+    assert vault.get("other") == "theirs"
+
+
+def cli_writer(process):
+    runner = CliRunner()
+    for i in range(WRITES):
+        result = runner.invoke(
+            cli,
+            [
+                "-s",
+                str(TEST_DATA_DIR / "secrets-conc-4.yml.enc"),
+                "-m",
+                str(TEST_DATA_DIR / "master-conc-4.key"),
+                "set",
+                f"p{process}.k{i}",
+                str(i),
+            ],
+            env={"MASTER_KEY": None},
+        )
+        assert result.exit_code == 0, result.output
+
+
+def library_writer(process):
+    for i in range(WRITES):
+        open_vault("conc-5").set(f"p{process}.k{i}", i).save()
+
+
+def hammer(name, writer):
+    create_vault(name)
+    with multiprocessing.get_context("fork").Pool(PROCESSES) as pool:
+        pool.map(writer, range(PROCESSES))
+
+    vault = open_vault(name)
+    for process in range(PROCESSES):
+        assert len(vault.get(f"p{process}")) == WRITES, vault.get(f"p{process}")
+
+
+def test_concurrent_cli_writers():
+    hammer("conc-4", cli_writer)
+
+
+def test_concurrent_library_writers():
+    hammer("conc-5", library_writer)
@@ -0,0 +1,116 @@
+import shutil
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from secrets_vault import SecretsVault, exceptions
+from secrets_vault.__main__ import cli
+
+BASE_DIR = Path(__file__).parent
+TEST_DATA_DIR = BASE_DIR / "test-data"
+
+LAYERS = {
+    "base": {
+        "database-url": "postgres://localhost/dev",
+        "aws": {"region": "eu-west-1", "access-key": "base-key"},
+        "smtp": {"host": "localhost", "port": 25},
+        "debug": True,
+    },
+    "prod": {
+        "database-url": "postgres://db.internal/prod",
+        "aws": {"access-key": "prod-key"},
+        "smtp": "disabled",
+    },
+    "region": {
+        "aws": {"region": "us-east-1"},
+    },
+}
+
+
+def create_layers(name):
+    master_key_filepath = TEST_DATA_DIR / f"master-{name}.key"
+    base_filepath = TEST_DATA_DIR / f"secrets-{name}-base.yml.enc"
+    _, master_key = SecretsVault.create(
+        secrets_filepath=base_filepath, master_key_filepath=master_key_filepath
+    )
+    filepaths = []
+    for layer, secrets in LAYERS.items():
+        filepath = TEST_DATA_DIR / f"secrets-{name}-{layer}.yml.enc"
+        if filepath != base_filepath:
+            shutil.copy(base_filepath, filepath)
+        vault = SecretsVault(master_key=master_key, secrets_filepath=filepath)
+        vault.secrets = secrets
+        vault.save()
+        filepaths.append(str(filepath))
+    return filepaths, master_key_filepath
+
+
+def test_later_layers_override_earlier_ones():
+    filepaths, master_key_filepath = create_layers("overlay-1")
+    vault = SecretsVault.open(
+        secrets_filepath=filepaths, master_key_filepath=master_key_filepath
+    )
+
+    assert vault.get("database-url") == "postgres://db.internal/prod"
+    assert vault.get("aws") == {"region": "us-east-1", "access-key": "prod-key"}
+    assert vault.get("aws.access-key") == "prod-key"
+    assert vault.get("debug") is True
+    # a value in a higher layer hides the dict below it
+    assert vault.get("smtp") == "disabled"
+    assert vault.get("smtp.host") is None
+    assert vault.get("missing", "default") == "default"
+    assert vault.secrets == {
+        "database-url": "postgres://db.internal/prod",
+        "aws": {"region": "us-east-1", "access-key": "prod-key"},
+        "smtp": "disabled",
+        "debug": True,
+    }
+
+
+def test_layers_are_loaded_lazily():
+    filepaths, master_key_filepath = create_layers("overlay-2")
+    vault = SecretsVault.open(
+        secrets_filepath=filepaths, master_key_filepath=master_key_filepath
+    )
+
+    # answered by the top layer alone
+    assert vault.get("aws.region") == "us-east-1"
+    assert [layer is not None for layer in vault._layers] == [False, False, True]
+
+    assert vault.get("database-url") == "postgres://db.internal/prod"
+    assert [layer is not None for layer in vault._layers] == [False, True, True]
+
+    assert len(vault.layers) == 3
+    assert all(layer is not None for layer in vault._layers)
+
+
+def test_layered_vault_is_read_only():
+    filepaths, master_key_filepath = create_layers("overlay-3")
+    vault = SecretsVault.open(
+        secrets_filepath=filepaths, master_key_filepath=master_key_filepath
+    )
+
+    try:
+        vault.set("foo", "bar")
+        assert False, "Should throw"
+    except exceptions.ReadOnlyVault:
+        pass
+
+
+def test_cli_reads_layers():
+    filepaths, master_key_filepath = create_layers("overlay-4")
+    runner = CliRunner()
+    args = [arg for filepath in filepaths for arg in ("-s", filepath)]
+    args += ["-m", str(master_key_filepath)]
+
+    result = runner.invoke(cli, [*args, "get", "aws.access-key"])
+    assert result.exit_code == 0, result.output
+    assert result.output == "prod-key\n"
+
+    result = runner.invoke(cli, [*args, "envify", "aws"])
+    assert result.exit_code == 0, result.output
+    assert result.output == "REGION=us-east-1\nACCESS_KEY=prod-key\n"
+
+    result = runner.invoke(cli, [*args, "set", "foo", "bar"])
+    assert result.exit_code != 0
+    assert "single vault" in result.output